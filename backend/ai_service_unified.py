@@ -1,128 +1,235 @@
-from typing import Optional
+from typing import AsyncIterator, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+
 from vector_search import get_vector_search
 from config import get_settings
-import requests
+from semantic_cache import get_semantic_cache
+from singleflight import SingleFlight
+from cache import normalize_query
+from providers import ProviderError, create_router
+from extractive import ExtractiveAnswerer
+from sessions import ConversationSession, get_session_store
+from scheduler import Overloaded
+
+NO_RESULTS_ANSWER = "I couldn't find relevant information to answer your question. Please try rephrasing or ask about USA, UK, Canada, or Australia."
 
 
 class UnifiedAIService:
     def __init__(self):
-        self.vector_search = get_vector_search()
         self.settings = get_settings()
-
-    def generate_answer(self, question: str, country: Optional[str] = None) -> str:
+        # NumPy retrieval runs here instead of on the event loop
+        self.retrieval_executor = ThreadPoolExecutor(
+            max_workers=self.settings.retrieval_workers,
+            thread_name_prefix="retrieval"
+        )
+        self.semantic_cache = get_semantic_cache()
+        # Identical questions arriving together share one retrieval and generation
+        self.single_flight = SingleFlight()
+        # LLM providers in fallback order, with timeouts, circuit breakers and optional hedging
+        self.router = create_router(self.settings)
+        # Cited extractive answer when no LLM answers (or all of them are saturated)
+        self.extractive = ExtractiveAnswerer(self.settings.extractive_max_sentences, self.settings.extractive_max_chars)
+        # Multi-turn conversations: previous results and provider context per session
+        self.sessions = get_session_store()
+
+    async def generate_answer(self, question: str, country: Optional[str] = None,
+                              session_id: Optional[str] = None) -> Tuple[str, bool]:
         """
-        Generate an answer to the question using vector search and selected AI provider
+        Generate an answer to the question using vector search and selected AI provider.
+        Concurrent calls for the same normalized question and country share one generation.
+        session_id: conversation the question continues (see sessions.py); such turns skip
+        the semantic cache and single-flight, since their answer depends on the conversation
+        Returns: (answer, cached); cached is True when the answer of a near-duplicate
+        question was reused from the semantic cache
         """
-        # Search for relevant document chunks
-        search_results = self.vector_search.search(
-            query=question,
-            country=country,
-            top_k=10,
-            use_gemini=False
-        )
+        if session_id is not None:
+            return await self._generate_answer(question, country, self.sessions.get(session_id))
+        if not self.settings.single_flight_enabled:
+            return await self._generate_answer(question, country)
+        key = (normalize_query(question), (country or "").lower())
+        return await self.single_flight.do(key, lambda: self._generate_answer(question, country))
+
+    async def _generate_answer(self, question: str, country: Optional[str],
+                               session: Optional[ConversationSession] = None) -> Tuple[str, bool]:
+        # One index snapshot for the whole request; reloads swap in a new instance
+        vector_search = await self.snapshot()
+        if session is None:
+            answer = await self.cached_answer(question, country, vector_search)
+            if answer is not None:
+                return answer, True
+
+        vector_search, search_results, token_counts = await self.retrieve(question, country, session, vector_search)
 
         if not search_results:
-            return "I couldn't find relevant information to answer your question. Please try rephrasing or ask about USA, UK, Canada, or Australia."
-
-        # Build context from search results
-        context = "\n\n".join([
-            f"[From {country}]: {text}"
-            for country, text, score in search_results
-        ])
+            return NO_RESULTS_ANSWER, False
 
-        # Generate answer based on AI provider
-        try:
-            if self.settings.ai_provider == "gemini":
-                return self._generate_with_gemini(question, context, country)
-            elif self.settings.ai_provider == "ollama":
-                return self._generate_with_ollama(question, context, country)
+        if not self.router.providers:
+            # No provider configured: extractive answer
+            answer = await self.extractive_answer(vector_search, question, country, search_results)
+        else:
+            # Each provider builds its context within its own token budget
+            try:
+                answer, _ = await self.router.generate(
+                    question, country, search_results, token_counts, session, vector_search
+                )
+            except Overloaded as e:
+                if not self.settings.extractive_on_overload:
+                    raise
+                print(f"AI providers overloaded: {e}, answering extractively")
+                answer = await self.extractive_answer(vector_search, question, country, search_results)
+            except ProviderError as e:
+                print(f"AI generation failed: {e}, using fallback")
+                answer = await self.extractive_answer(vector_search, question, country, search_results)
             else:
-                # Fallback to simple extraction
-                return self._generate_simple_answer(question, search_results, country)
-        except Exception as e:
-            print(f"AI generation failed: {e}, using fallback")
-            return self._generate_simple_answer(question, search_results, country)
-
-    def _generate_with_gemini(self, question: str, context: str, country: Optional[str]) -> str:
-        """Generate answer using Google Gemini"""
-        import google.generativeai as genai
-
-        genai.configure(api_key=self.settings.gemini_api_key)
-        model = genai.GenerativeModel('gemini-2.0-flash-exp')
-
-        country_filter = f" about {country}" if country else ""
-
-        prompt = f"""You are a helpful study abroad assistant for USA, UK, Canada, and Australia.
-
-Question: {question}{country_filter}
-
-Context from study abroad guides:
-{context}
-
-Instructions:
-1. Answer the question based on the context provided
-2. If the context contains information from multiple countries, use only the relevant country's information
-3. If the context doesn't have the specific information requested, say: "I don't have specific information about [topic] in the documents."
-4. Provide clear, helpful, and well-formatted answers
-5. Use bullet points or numbered lists when appropriate"""
-
-        response = model.generate_content(prompt)
-        return response.text
-
-    def _generate_with_ollama(self, question: str, context: str, country: Optional[str]) -> str:
-        """Generate answer using Ollama"""
-        country_filter = f" about {country}" if country else ""
-
-        prompt = f"""You are a helpful study abroad assistant for USA, UK, Canada, and Australia.
-
-Question: {question}{country_filter}
-
-Context from study abroad guides:
-{context}
+                if session is None:
+                    await self.remember(vector_search, question, country, answer)
 
-Instructions:
-1. Answer the question based on the context provided
-2. If the context contains information from multiple countries, use only the relevant country's information
-3. If the context doesn't have the specific information requested, say: "I don't have specific information about [topic] in the documents."
-4. Provide clear, helpful, and well-formatted answers
-5. Use bullet points or numbered lists when appropriate
+        self.end_turn(session, question, country, search_results, token_counts)
+        return answer, False
 
-Answer:"""
-
-        # Call Ollama API
-        payload = {
-            "model": self.settings.ollama_model,
-            "prompt": prompt,
-            "stream": False
-        }
+    async def stream_answer(self, question: str, country: Optional[str] = None,
+                            session_id: Optional[str] = None, vector_search=None) -> AsyncIterator[str]:
+        """
+        Like generate_answer, but yield the answer in pieces as the provider produces them.
+        Falls back to the extractive answer if the provider fails before sending anything;
+        a failure after that is re-raised, since the partial answer has been sent already.
+        Does not consult the semantic cache (callers check cached_answer() first, unless
+        the question belongs to a session), but a completed provider answer outside a
+        session is added to it.
+        vector_search: the index snapshot the caller checked the cache against, if any
+        """
+        session = self.sessions.get(session_id) if session_id is not None else None
+        if vector_search is None:
+            vector_search = await self.snapshot()
+        vector_search, search_results, token_counts = await self.retrieve(question, country, session, vector_search)
+        if not search_results:
+            yield NO_RESULTS_ANSWER
+            return
 
-        response = requests.post(self.settings.ollama_url, json=payload, timeout=60)
+        if not self.router.providers:
+            yield await self.extractive_answer(vector_search, question, country, search_results)
+            self.end_turn(session, question, country, search_results, token_counts)
+            return
 
-        if response.status_code == 200:
-            result = response.json()
-            return result.get("response", "").strip()
+        parts = []
+        try:
+            async for token in self.router.stream(question, country, search_results, token_counts, session,
+                                                  vector_search):
+                if token:
+                    parts.append(token)
+                    yield token
+        except Overloaded as e:
+            if not self.settings.extractive_on_overload:
+                # Let the caller turn the request away rather than answer degraded
+                raise
+            print(f"AI providers overloaded: {e}, answering extractively")
+            yield await self.extractive_answer(vector_search, question, country, search_results)
+        except Exception as e:
+            if parts:
+                raise
+            print(f"AI generation failed: {e}, using fallback")
+            yield await self.extractive_answer(vector_search, question, country, search_results)
         else:
-            raise Exception(f"Ollama API error: {response.status_code}")
-
-    def _generate_simple_answer(self, question: str, search_results, country: Optional[str]) -> str:
-        """Fallback: Generate simple answer from search results"""
-        country_filter = f" about {country}" if country else ""
-
-        # Get the best match
-        best_country, best_text, best_score = search_results[0]
-
-        # Extract relevant portion (first 800 chars of most relevant chunk)
-        relevant_text = best_text[:800] if len(best_text) > 800 else best_text
-
-        answer = f"""Based on the study abroad information{country_filter}:
-
-{relevant_text}
-
-Source: {best_country} Study Abroad Guide
+            if session is None:
+                await self.remember(vector_search, question, country, "".join(parts))
+        self.end_turn(session, question, country, search_results, token_counts)
+
+    def end_turn(self, session: Optional[ConversationSession], question: str, country: Optional[str],
+                 search_results, token_counts) -> None:
+        """Record an answered turn in its session, if any"""
+        if session is not None:
+            session.record_turn(question, country, search_results, token_counts)
+            self.sessions.trim(session)
+
+    async def snapshot(self):
+        """The current index snapshot (loaded in the executor if this is the first request)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.retrieval_executor, get_vector_search)
+
+    async def cached_answer(self, question: str, country: Optional[str] = None,
+                            vector_search=None) -> Optional[str]:
+        """
+        Answer of a near-duplicate question for the same country from the semantic cache, if any.
+        vector_search: the request's index snapshot (the current one when not given)
+        """
+        if not self.settings.semantic_cache_enabled:
+            return None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.retrieval_executor, self._cached_answer, question, country, vector_search
+        )
 
-Note: This is a direct excerpt from the official guide. For more detailed information, please ask more specific questions."""
+    def _cached_answer(self, question: str, country: Optional[str], vector_search) -> Optional[str]:
+        if vector_search is None:
+            vector_search = get_vector_search()
+        embedding = vector_search.get_embedding(question, use_gemini=False)
+        return self.semantic_cache.get(vector_search.version, country, embedding)
+
+    async def remember(self, vector_search, question: str, country: Optional[str], answer: str) -> None:
+        """Add a generated answer to the semantic cache, tagged with the index snapshot it came from"""
+        if not self.settings.semantic_cache_enabled or not answer.strip():
+            return
+        loop = asyncio.get_running_loop()
+        embedding = await loop.run_in_executor(
+            self.retrieval_executor, vector_search.get_embedding, question, False
+        )
+        self.semantic_cache.put(vector_search.version, country, embedding, answer)
 
-        return answer
+    async def retrieve(self, question: str, country: Optional[str], session: Optional[ConversationSession] = None,
+                       vector_search=None):
+        """
+        Run retrieval in the executor, on the given index snapshot or the current one.
+        Within a session, a short follow-up is searched together with the previous
+        question, and the previous results are reused if nothing is found.
+        Returns: (index snapshot, List of (country, text_chunk, score), token count per chunk)
+        """
+        loop = asyncio.get_running_loop()
+        query = session.retrieval_query(question) if session is not None else question
+        vector_search, search_results, token_counts = await loop.run_in_executor(
+            self.retrieval_executor, self._retrieve, query, country, vector_search
+        )
+        if not search_results and session is not None and session.last_results and country == session.last_country:
+            return vector_search, session.last_results, session.last_token_counts
+        return vector_search, search_results, token_counts
+
+    def _retrieve(self, question: str, country: Optional[str], vector_search=None):
+        """Retrieve the chunks used as context: (index snapshot, List of (country, text_chunk, score), token counts)"""
+        # Take one index snapshot for the whole request; reloads swap in a new instance
+        if vector_search is None:
+            vector_search = get_vector_search()
+
+        # Search for relevant document chunks, skipping near-duplicate passages
+        if self.settings.mmr_enabled:
+            search_results = vector_search.search_diverse(
+                query=question,
+                country=country,
+                top_k=10,
+                fetch_k=self.settings.mmr_fetch_k,
+                lambda_mult=self.settings.mmr_lambda,
+                max_similarity=self.settings.mmr_max_similarity,
+                use_gemini=False,
+                mode=self.settings.search_mode,
+                with_tokens=True
+            )
+        else:
+            search_results = vector_search.search(
+                query=question,
+                country=country,
+                top_k=10,
+                use_gemini=False,
+                mode=self.settings.search_mode,
+                with_tokens=True
+            )
+        token_counts = [tokens for _, _, _, tokens in search_results]
+        return vector_search, [result[:3] for result in search_results], token_counts
+
+    async def extractive_answer(self, vector_search, question: str, country: Optional[str], search_results) -> str:
+        """Cited extractive answer from the retrieved chunks (see extractive.py), computed in the executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.retrieval_executor, self.extractive.answer, question, country, search_results, vector_search.embedder
+        )
 
 
 # Global instance
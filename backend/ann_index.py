@@ -0,0 +1,314 @@
+"""
+Inverted-file (IVF) approximate nearest-neighbour index over the normalized
+search matrix built by VectorSearch.
+
+Rows are clustered with spherical k-means; a query scores the centroids,
+probes the `nprobe` closest lists and ranks only the rows in them. Larger
+`nprobe` means higher recall and higher latency; nprobe == n_lists is exact.
+
+The index is persisted next to the embeddings inside the binary store:
+
+    ivf.json          list count, dimension and the store generation it was built from
+    ivf_centroids.f32 float32 centroids, n_lists x dim
+    ivf_offsets.i64   int64 start of each inverted list (n_lists + 1 entries)
+    ivf_positions.i64 int64 search-matrix positions, grouped by list
+
+Build and evaluate from the command line:
+
+    python ann_index.py build study_abroad_store --lists 256
+    python ann_index.py eval study_abroad_store --nprobe 1 4 16 --top-k 10
+"""
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from embedding_store import write_array
+from quantization import dequantize, scores as quantized_scores
+
+INDEX_META_FILE = "ivf.json"
+CENTROIDS_FILE = "ivf_centroids.f32"
+OFFSETS_FILE = "ivf_offsets.i64"
+POSITIONS_FILE = "ivf_positions.i64"
+
+# Rows scored against the centroids at a time while assigning the full matrix
+ASSIGN_BLOCK_ROWS = 65536
+
+
+def default_n_lists(count: int) -> int:
+    """Rule of thumb: about 4 * sqrt(N) lists"""
+    return int(max(1, min(count, round(4 * np.sqrt(count)))))
+
+
+def resolve_n_lists(n_lists: Optional[int], count: int) -> int:
+    """List count an index over count rows gets: n_lists (default_n_lists when unset), at most one per row"""
+    return int(max(1, min(n_lists or default_n_lists(count), count)))
+
+
+def _assign(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Index of the most similar centroid for every row, computed in blocks.
+    The argmax ignores row scale, so int8 rows can be assigned without their scales.
+    """
+    assignments = np.empty(len(matrix), dtype=np.int64)
+    for start in range(0, len(matrix), ASSIGN_BLOCK_ROWS):
+        block = np.asarray(matrix[start:start + ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def train_centroids(
+        matrix: np.ndarray,
+        n_lists: int,
+        n_iter: int = 20,
+        sample_size: Optional[int] = None,
+        seed: int = 0
+) -> np.ndarray:
+    """Spherical k-means on a sample of the rows (which may be stored as int8)"""
+    rng = np.random.default_rng(seed)
+    count = len(matrix)
+    sample_size = min(count, sample_size or max(n_lists * 64, 10000))
+    sample_rows = np.sort(rng.choice(count, size=sample_size, replace=False))
+    sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+    norms = np.linalg.norm(sample, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    sample /= norms
+    # Every list is seeded from a distinct sample row
+    n_lists = min(n_lists, len(sample))
+
+    centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+    for _ in range(n_iter):
+        assignments = _assign(sample, centroids)
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=n_lists)
+        nonempty = counts > 0
+
+        sums = np.zeros_like(centroids)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums[nonempty] = np.add.reduceat(sample[order], starts[nonempty], axis=0)
+
+        # Re-seed empty lists from random sample rows
+        n_empty = int((~nonempty).sum())
+        if n_empty:
+            sums[~nonempty] = sample[rng.choice(len(sample), size=n_empty, replace=False)]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+
+    return centroids
+
+
+class IVFIndex:
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, positions: np.ndarray, generation: int = 0):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.positions = positions
+        self.generation = generation
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def count(self) -> int:
+        return len(self.positions)
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, n_lists: Optional[int] = None, generation: int = 0, **kwargs) -> "IVFIndex":
+        """Train centroids and fill the inverted lists for every row of matrix"""
+        n_lists = resolve_n_lists(n_lists, len(matrix))
+        print(f"Building IVF index with {n_lists} lists over {len(matrix)} rows...")
+        centroids = train_centroids(matrix, n_lists, **kwargs)
+
+        assignments = _assign(matrix, centroids)
+        positions = np.argsort(assignments, kind="stable").astype(np.int64)
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=n_lists)))).astype(np.int64)
+        return cls(centroids, offsets, positions, generation)
+
+    def extend(self, position_map: np.ndarray, new_positions: np.ndarray, new_vectors: np.ndarray,
+               generation: int) -> "IVFIndex":
+        """
+        Return a new index with rows added, keeping the trained centroids.
+        position_map maps every old search-matrix position to its new position
+        (rows shift when chunks are inserted into earlier country partitions).
+        """
+        old_lists = np.repeat(np.arange(self.n_lists), np.diff(self.offsets))
+        new_lists = _assign(new_vectors, self.centroids)
+
+        lists = np.concatenate([old_lists, new_lists])
+        positions = np.concatenate([position_map[self.positions], new_positions]).astype(np.int64)
+        order = np.argsort(lists, kind="stable")
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(lists, minlength=self.n_lists)))).astype(np.int64)
+        return IVFIndex(self.centroids, offsets, positions[order], generation)
+
+    def search(
+            self,
+            query: np.ndarray,
+            matrix: np.ndarray,
+            top_k: int,
+            nprobe: int,
+            partition: Optional[slice] = None,
+            scales: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k for one normalized query.
+        partition restricts results to a slice of the search matrix (a country filter).
+        When the nprobe closest lists hold fewer than top_k rows of the partition,
+        further lists are probed in centroid order (doubling each round) until
+        they do, so a filter on a small country still gets top_k results.
+        scales are the per-row scales of an int8 matrix (see quantization.py).
+        Returns: (search-matrix positions, similarity scores), best first
+        """
+        nprobe = max(1, min(nprobe, self.n_lists))
+        order = np.argsort(-(self.centroids @ query))
+
+        candidates = self._candidates(order[:nprobe], partition)
+        probed = nprobe
+        while len(candidates) < top_k and probed < self.n_lists:
+            more = order[probed:2 * probed]
+            probed += len(more)
+            candidates = np.concatenate([candidates, self._candidates(more, partition)])
+
+        k = min(top_k, len(candidates))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = quantized_scores(matrix[candidates], scales[candidates] if scales is not None else None, query)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return candidates[top], scores[top]
+
+    def _candidates(self, lists: np.ndarray, partition: Optional[slice]) -> np.ndarray:
+        """Search-matrix positions in the given inverted lists, restricted to partition"""
+        if not len(lists):
+            return np.empty(0, dtype=np.int64)
+        candidates = np.concatenate([self.positions[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+        if partition is not None:
+            candidates = candidates[(candidates >= partition.start) & (candidates < partition.stop)]
+        return candidates
+
+    def save(self, path: str) -> None:
+        """Write the index into a store directory"""
+        write_array(os.path.join(path, CENTROIDS_FILE), self.centroids.astype(np.float32))
+        write_array(os.path.join(path, OFFSETS_FILE), self.offsets.astype(np.int64))
+        write_array(os.path.join(path, POSITIONS_FILE), np.asarray(self.positions, dtype=np.int64))
+
+        meta = {
+            "n_lists": self.n_lists,
+            "dim": int(self.centroids.shape[1]),
+            "count": self.count,
+            "generation": self.generation,
+        }
+        tmp_path = os.path.join(path, INDEX_META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, os.path.join(path, INDEX_META_FILE))
+
+    @classmethod
+    def load(cls, path: str, count: int, generation: int, n_lists: Optional[int] = None) -> Optional["IVFIndex"]:
+        """
+        Open a persisted index, or return None if it is missing, was built from other
+        data or, when n_lists is given, has a different list count than it would get now
+        """
+        meta_path = os.path.join(path, INDEX_META_FILE)
+        if not os.path.isfile(meta_path):
+            return None
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["count"] != count or meta["generation"] != generation:
+            return None
+        if n_lists is not None and meta["n_lists"] != resolve_n_lists(n_lists, count):
+            return None
+
+        n_lists, dim = meta["n_lists"], meta["dim"]
+        centroids = np.fromfile(os.path.join(path, CENTROIDS_FILE), dtype=np.float32).reshape(n_lists, dim)
+        offsets = np.fromfile(os.path.join(path, OFFSETS_FILE), dtype=np.int64)
+        positions = np.memmap(os.path.join(path, POSITIONS_FILE), dtype=np.int64, mode="r", shape=(count,))
+        return cls(centroids, offsets, positions, generation)
+
+
+def recall_at_k(exact: np.ndarray, approx: np.ndarray) -> float:
+    """Mean fraction of the exact top-k found in the approximate top-k, per query"""
+    hits = [len(np.intersect1d(e, a)) / max(1, len(e)) for e, a in zip(exact, approx)]
+    return float(np.mean(hits)) if hits else 0.0
+
+
+def evaluate(
+        vs,
+        index: IVFIndex,
+        nprobe_values: List[int],
+        top_k: int = 10,
+        n_queries: int = 200,
+        noise: float = 0.1,
+        seed: int = 0
+) -> List[Dict[str, float]]:
+    """
+    Compare the IVF index with exact search on perturbed document vectors.
+    Returns one row per nprobe with recall@k and mean latency in milliseconds.
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(vs.matrix), size=min(n_queries, len(vs.matrix)), replace=False))
+    scales = vs.matrix_scales
+    queries = dequantize(vs.matrix[rows], scales[rows] if scales is not None else None)
+    queries += noise * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    start = time.perf_counter()
+    exact = [
+        np.argpartition(-quantized_scores(vs.matrix, scales, q), min(top_k, len(vs.matrix)) - 1)[:top_k]
+        for q in queries
+    ]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    report = [{"nprobe": 0, "recall": 1.0, "latency_ms": exact_ms}]
+    for nprobe in nprobe_values:
+        start = time.perf_counter()
+        approx = [index.search(q, vs.matrix, top_k, nprobe, scales=scales)[0] for q in queries]
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        report.append({"nprobe": nprobe, "recall": recall_at_k(exact, approx), "latency_ms": latency_ms})
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from vector_search import VectorSearch
+
+    parser = argparse.ArgumentParser(description="Build and evaluate the IVF index of an embedding store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Train and persist the index")
+    build.add_argument("store_path")
+    build.add_argument("--lists", type=int, default=None, help="Number of inverted lists (default: 4 * sqrt(N))")
+    build.add_argument("--iterations", type=int, default=20)
+
+    evaluate_parser = subparsers.add_parser("eval", help="Report recall@k and latency against exact search")
+    evaluate_parser.add_argument("store_path")
+    evaluate_parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    evaluate_parser.add_argument("--top-k", type=int, default=10)
+    evaluate_parser.add_argument("--queries", type=int, default=200)
+
+    args = parser.parse_args(argv)
+    vs = VectorSearch(args.store_path)
+
+    if args.command == "build":
+        index = IVFIndex.build(vs.matrix, n_lists=args.lists, generation=vs.store.generation, n_iter=args.iterations)
+        index.save(args.store_path)
+        print(f"Saved IVF index with {index.n_lists} lists to {args.store_path}")
+
+    elif args.command == "eval":
+        index = IVFIndex.load(args.store_path, len(vs.matrix), vs.store.generation)
+        if index is None:
+            raise SystemExit("No up-to-date IVF index found; run the build command first")
+
+        print(f"{'nprobe':>8} {'recall@' + str(args.top_k):>10} {'latency_ms':>12}")
+        for row in evaluate(vs, index, args.nprobe, top_k=args.top_k, n_queries=args.queries):
+            label = "exact" if row["nprobe"] == 0 else str(row["nprobe"])
+            print(f"{label:>8} {row['recall']:>10.3f} {row['latency_ms']:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Cold start of the API: import time of main.py, and for a real uvicorn worker the
+time until it accepts connections, until GET /ready reports it warm, and the
+latency of the first request.
+
+Run from the directory the API runs in (it needs the same .env and store):
+
+    python benchmarks/bench_cold_start.py
+    python benchmarks/bench_cold_start.py --runs 5 --json cold_start.json
+    WARMUP_ENABLED=false python benchmarks/bench_cold_start.py   # compare with lazy loading
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Workers run in the current directory with the backend modules importable
+ENV = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get("PYTHONPATH")])))
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def measure_import(runs: int) -> List[float]:
+    """Seconds to import main.py, each in a fresh interpreter"""
+    times = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            env=ENV, capture_output=True, text=True, check=True
+        ).stdout
+        times.append(float(out.strip().splitlines()[-1]))
+    return times
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str, timeout: float = 30.0) -> Optional[int]:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def measure_server(path: str, timeout: float) -> Dict:
+    """Start a uvicorn worker and time it until listening, until ready and through its first request"""
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=ENV, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    result: Dict = {}
+    try:
+        deadline = started + timeout
+        while "listening_seconds" not in result or "ready_seconds" not in result:
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"worker not ready after {timeout}s")
+            status = _get(base + "/ready", timeout=1.0)
+            if status is not None and "listening_seconds" not in result:
+                result["listening_seconds"] = time.perf_counter() - started
+            if status == 200:
+                result["ready_seconds"] = time.perf_counter() - started
+            else:
+                time.sleep(0.02)
+
+        request_started = time.perf_counter()
+        result["first_request_status"] = _get(base + path)
+        result["first_request_latency_seconds"] = time.perf_counter() - request_started
+
+        with urllib.request.urlopen(base + "/ready") as response:
+            result["worker"] = json.load(response)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure API import time and time to first request")
+    parser.add_argument("--runs", type=int, default=3, help="import and server measurements to take")
+    parser.add_argument("--path", default="/api/countries", help="endpoint used as the first request")
+    parser.add_argument("--timeout", type=float, default=300.0, help="seconds to wait for the worker to be ready")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    import_times = measure_import(args.runs)
+    servers = [measure_server(args.path, args.timeout) for _ in range(args.runs)]
+
+    print(f"import main.py        median {statistics.median(import_times):.3f}s  (runs: "
+          + ", ".join(f"{t:.3f}" for t in import_times) + ")")
+    for key, label in [
+        ("listening_seconds", "accepting connections"),
+        ("ready_seconds", "ready (warm)"),
+        ("first_request_latency_seconds", f"first {args.path}"),
+    ]:
+        values = [server[key] for server in servers]
+        print(f"{label:<22}median {statistics.median(values):.3f}s")
+    print("warmup steps (last run):", json.dumps(servers[-1]["worker"].get("steps", {})))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"import_seconds": import_times, "servers": servers}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
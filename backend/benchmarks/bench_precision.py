@@ -0,0 +1,121 @@
+"""
+Memory, latency and recall of the search matrix at each storage precision.
+
+Recall@k is measured against exact float32 search, for the compact matrix on
+its own ("rescore off") and with float32 rescoring of top_k * factor candidates.
+
+    python benchmarks/bench_precision.py                          # synthetic 100k x 768 corpus
+    python benchmarks/bench_precision.py --store study_abroad_store --top-k 5
+    python benchmarks/bench_precision.py --rows 500000 --json results.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_store import StoreWriter  # noqa: E402
+from quantization import PRECISIONS, nbytes, scores as quantized_scores  # noqa: E402
+from vector_search import VectorSearch, DEFAULT_RESCORE_FACTOR  # noqa: E402
+
+
+def synthetic_store(path: str, rows: int, dim: int, n_clusters: int = 256, seed: int = 0) -> None:
+    """Write a clustered random corpus (4 countries) to a new store"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    countries = ["USA", "UK", "Canada", "Australia"]
+    with StoreWriter(path, dim=dim) as writer:
+        for start in range(0, rows, 10000):
+            n = min(10000, rows - start)
+            vectors = centers[rng.integers(0, n_clusters, n)] + rng.standard_normal((n, dim)).astype(np.float32)
+            writer.add_batch([countries[i % 4] for i in range(start, start + n)], [""] * n, vectors)
+
+
+def sample_queries(vs: VectorSearch, n_queries: int, noise: float, seed: int = 0) -> np.ndarray:
+    """Perturbed copies of random document vectors"""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(vs.row_ids), size=min(n_queries, len(vs.row_ids)), replace=False)
+    vectors = np.asarray(vs.embeddings)[np.sort(vs.row_ids[rows])]
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors + noise * rng.standard_normal(vectors.shape).astype(np.float32) / np.sqrt(vectors.shape[1])
+
+
+def _rank_compact(vs: VectorSearch, query: np.ndarray, top_k: int) -> np.ndarray:
+    """Top-k document rows by the compact matrix alone, without rescoring"""
+    scores = quantized_scores(vs.matrix, vs.matrix_scales, query / np.linalg.norm(query))
+    top = np.argpartition(-scores, top_k - 1)[:top_k]
+    return vs.row_ids[top[np.argsort(-scores[top])]]
+
+
+def run(store_path: str, queries_count: int, top_k: int, rescore_factor: int, noise: float) -> List[Dict]:
+    report = []
+    exact_rows: Optional[List[np.ndarray]] = None
+    queries = None
+
+    for precision in PRECISIONS:
+        vs = VectorSearch(store_path, precision=precision, rescore_factor=rescore_factor)
+        if queries is None:
+            queries = sample_queries(vs, queries_count, noise)
+
+        searches = [("-" if precision == "float32" else f"top_k x {rescore_factor}",
+                     lambda q: vs._rank(q, None, top_k)[0])]
+        if precision != "float32":
+            searches.insert(0, ("off", lambda q: _rank_compact(vs, q, top_k)))
+
+        for rescore, search in searches:
+            start = time.perf_counter()
+            ranked = [search(q) for q in queries]
+            latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+            if exact_rows is None:
+                exact_rows = ranked
+            recall = float(np.mean([len(np.intersect1d(e, r)) / max(1, len(e)) for e, r in zip(exact_rows, ranked)]))
+            report.append({
+                "precision": precision,
+                "rescore": rescore,
+                "matrix_mb": nbytes(vs.matrix, vs.matrix_scales) / 1e6,
+                "latency_ms": latency_ms,
+                f"recall@{top_k}": recall,
+            })
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark float32 / int8 search matrices")
+    parser.add_argument("--store", default=None, help="Existing store to benchmark (default: synthetic corpus)")
+    parser.add_argument("--rows", type=int, default=100000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--rescore-factor", type=int, default=DEFAULT_RESCORE_FACTOR)
+    parser.add_argument("--noise", type=float, default=0.5, help="Query perturbation relative to a unit vector")
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = args.store
+        if store_path is None:
+            store_path = os.path.join(tmp, "store")
+            print(f"Writing synthetic corpus: {args.rows} x {args.dim}")
+            synthetic_store(store_path, args.rows, args.dim)
+        report = run(store_path, args.queries, args.top_k, args.rescore_factor, args.noise)
+
+    recall_key = f"recall@{args.top_k}"
+    print(f"\n{'precision':>10} {'rescore':>12} {'matrix_mb':>10} {'latency_ms':>11} {recall_key:>10}")
+    for row in report:
+        print(f"{row['precision']:>10} {row['rescore']:>12} {row['matrix_mb']:>10.1f} "
+              f"{row['latency_ms']:>11.3f} {row[recall_key]:>10.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Retrieval benchmarks across corpus sizes, with a regression check against a stored baseline.
+
+For each synthetic corpus size (768-dim clustered vectors, 4 countries) and
+each index mode, a fresh process opens the store and measures:
+
+- load time: first open (builds anything missing, e.g. the IVF index) and a re-open;
+- resident memory added by the loaded index (RSS, including mapped pages touched);
+- single-query latency p50/p95, unfiltered and filtered to one country;
+- batched search (search_batch) time per query;
+- recall@k of every mode against exact float32 search.
+
+Each mode is measured --repeat times (a fresh process each time) and every
+metric is the median of the repetitions, so one slow run does not move it.
+
+Modes: exact (float32 brute force, the reference), int8 (compact matrix plus
+float32 rescoring) and ivf (approximate, see ann_index.py).
+
+    python benchmarks/bench_retrieval.py                                  # 1k .. 1M chunks (1M needs ~6 GB)
+    python benchmarks/bench_retrieval.py --sizes 1000,10000,100000 --json retrieval.json
+    python benchmarks/bench_retrieval.py --baseline benchmarks/retrieval_baseline.json   # exit 1 on regression
+    python benchmarks/bench_retrieval.py --sizes 1000,10000 --save-baseline benchmarks/retrieval_baseline.json
+
+A metric regresses when it is worse than the baseline by more than --threshold
+(relative) and by more than an absolute noise floor (--min-delta-ms for
+latencies, ABSOLUTE_SLACK for load time and memory), or when recall drops by
+more than --recall-tolerance. Without --sizes, a baseline run uses the sizes
+stored in the baseline. The committed retrieval_baseline.json was recorded on
+the reference machine; save a new one before comparing on other hardware.
+"""
+import argparse
+import gc
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_precision import sample_queries, synthetic_store  # noqa: E402
+from vector_search import VectorSearch  # noqa: E402
+
+DEFAULT_SIZES = "1000,10000,100000,1000000"
+MODES = {
+    "exact": {"index_type": "exact", "precision": "float32"},
+    "int8": {"index_type": "exact", "precision": "int8"},
+    "ivf": {"index_type": "ivf", "precision": "float32"},
+}
+
+# Metrics checked against the baseline: name -> True if higher is worse
+CHECKED_METRICS = {
+    "load_seconds": True,
+    "rss_mb": True,
+    "query_p50_ms": True,
+    "query_p95_ms": True,
+    "filtered_p50_ms": True,
+    "filtered_p95_ms": True,
+    "batch_ms_per_query": True,
+    "recall": False,
+}
+# Differences below these are noise whatever the ratio (latencies use --min-delta-ms)
+ABSOLUTE_SLACK = {"load_seconds": 0.1, "rss_mb": 2.0}
+
+
+def _rss_mb() -> float:
+    """Current resident set size (Linux /proc), or the peak from getrusage elsewhere"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def _percentiles_ms(latencies: List[float]) -> tuple:
+    values = np.asarray(latencies) * 1000
+    return float(np.percentile(values, 50)), float(np.percentile(values, 95))
+
+
+def measure(store_path: str, mode: str, n_queries: int, top_k: int, noise: float, nprobe: int) -> Dict:
+    """One mode on one store, in a fresh process so load time and memory start clean"""
+    options = dict(MODES[mode], ivf_nprobe=nprobe)
+    rss_before = _rss_mb()
+
+    started = time.perf_counter()
+    vs = VectorSearch(store_path, **options)
+    load_cold = time.perf_counter() - started
+    del vs
+    gc.collect()
+
+    started = time.perf_counter()
+    vs = VectorSearch(store_path, **options)
+    load = time.perf_counter() - started
+
+    queries = sample_queries(vs, n_queries, noise)
+    countries = vs.get_available_countries()
+
+    # One untimed pass touches the mapped pages, as a warm worker would have them
+    for q in queries[:8]:
+        vs._rank(q, None, top_k)
+
+    ranked, latencies = [], []
+    for q in queries:
+        started = time.perf_counter()
+        rows, _ = vs._rank(q, None, top_k)
+        latencies.append(time.perf_counter() - started)
+        ranked.append(rows.tolist())
+    query_p50, query_p95 = _percentiles_ms(latencies)
+
+    latencies = []
+    for i, q in enumerate(queries):
+        country = countries[i % len(countries)]
+        started = time.perf_counter()
+        vs._rank(q, country, top_k)
+        latencies.append(time.perf_counter() - started)
+    filtered_p50, filtered_p95 = _percentiles_ms(latencies)
+
+    started = time.perf_counter()
+    vs.search_batch(queries, top_k=top_k)
+    batch_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    return {
+        "mode": mode,
+        "rows": len(vs.matrix),
+        "load_cold_seconds": load_cold,
+        "load_seconds": load,
+        "rss_mb": _rss_mb() - rss_before,
+        "query_p50_ms": query_p50,
+        "query_p95_ms": query_p95,
+        "filtered_p50_ms": filtered_p50,
+        "filtered_p95_ms": filtered_p95,
+        "batch_ms_per_query": batch_ms,
+        "ranked": ranked,
+    }
+
+
+def _median_row(rows: List[Dict]) -> Dict:
+    """Per-metric median of repeated measurements; rankings come from the first run"""
+    row = dict(rows[0])
+    for key, value in rows[0].items():
+        if isinstance(value, float):
+            row[key] = float(np.median([r[key] for r in rows]))
+    return row
+
+
+def run(sizes: List[int], modes: List[str], args, tmp: str) -> List[Dict]:
+    results = []
+    context = get_context("spawn")
+    for size in sizes:
+        store_path = os.path.join(tmp, f"store_{size}")
+        print(f"Writing synthetic corpus: {size} x {args.dim}")
+        started = time.perf_counter()
+        synthetic_store(store_path, size, args.dim)
+        # The first open fits the query embedder and builds BM25, which later opens reuse
+        VectorSearch(store_path)
+        print(f"  written and prepared in {time.perf_counter() - started:.1f}s")
+
+        exact = None
+        for mode in ["exact"] + [m for m in modes if m != "exact"]:
+            repeats = []
+            for _ in range(max(1, args.repeat)):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    repeats.append(pool.submit(measure, store_path, mode, args.queries, args.top_k, args.noise,
+                                               args.nprobe).result())
+            row = _median_row(repeats)
+            ranked = row.pop("ranked")
+            if exact is None:
+                exact = ranked
+            row["recall"] = float(np.mean([len(set(e) & set(r)) / max(1, len(e)) for e, r in zip(exact, ranked)]))
+            row["size"] = size
+            if mode in modes:
+                results.append(row)
+                print(f"  {mode:<8} load {row['load_seconds']:.2f}s  query p50 {row['query_p50_ms']:.3f}ms")
+    return results
+
+
+def compare(results: List[Dict], baseline: List[Dict], threshold: float, min_delta_ms: float,
+            recall_tolerance: float) -> List[str]:
+    """Regressions of results against baseline, as readable lines"""
+    previous = {(row["size"], row["mode"]): row for row in baseline}
+    regressions = []
+    for row in results:
+        base = previous.get((row["size"], row["mode"]))
+        if base is None:
+            continue
+        for metric, higher_is_worse in CHECKED_METRICS.items():
+            if base.get(metric) is None or row.get(metric) is None:
+                continue
+            new, old = row[metric], base[metric]
+            if not higher_is_worse:
+                if new < old - recall_tolerance:
+                    regressions.append(f"{row['size']} {row['mode']}: {metric} {old:.3f} -> {new:.3f}")
+                continue
+            slack = ABSOLUTE_SLACK.get(metric, min_delta_ms)
+            if new > old * (1 + threshold) and new - old > slack:
+                regressions.append(f"{row['size']} {row['mode']}: {metric} {old:.3f} -> {new:.3f} "
+                                   f"(+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark VectorSearch load, memory, latency and recall by size")
+    parser.add_argument("--sizes", default=None, help=f"Comma-separated corpus sizes (default {DEFAULT_SIZES}, "
+                        "or the baseline's sizes with --baseline)")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"Comma-separated subset of {', '.join(MODES)}")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per mode; each metric is their median")
+    parser.add_argument("--nprobe", type=int, default=8, help="IVF lists probed per query")
+    parser.add_argument("--noise", type=float, default=0.5, help="Query perturbation relative to a unit vector")
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    parser.add_argument("--baseline", default=None, help="Fail (exit 1) on regressions against this results file")
+    parser.add_argument("--save-baseline", default=None, help="Write the results as a new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative slowdown / growth")
+    parser.add_argument("--min-delta-ms", type=float, default=0.25, help="Latency differences ignored as noise")
+    parser.add_argument("--recall-tolerance", type=float, default=0.02, help="Allowed absolute recall drop")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    if args.sizes is None:
+        args.sizes = ",".join(str(size) for size in sorted({row["size"] for row in baseline})) if baseline \
+            else DEFAULT_SIZES
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run(sizes, modes, args, tmp)
+
+    print(f"\n{'size':>9} {'mode':>8} {'load_s':>7} {'cold_s':>7} {'rss_mb':>8} {'p50_ms':>8} {'p95_ms':>8} "
+          f"{'filt_p50':>9} {'batch_ms':>9} {'recall':>7}")
+    for row in results:
+        print(f"{row['size']:>9} {row['mode']:>8} {row['load_seconds']:>7.2f} {row['load_cold_seconds']:>7.2f} "
+              f"{row['rss_mb']:>8.1f} {row['query_p50_ms']:>8.3f} {row['query_p95_ms']:>8.3f} "
+              f"{row['filtered_p50_ms']:>9.3f} {row['batch_ms_per_query']:>9.3f} {row['recall']:>7.3f}")
+
+    report = {"args": vars(args), "results": results}
+    for path in filter(None, [args.json, args.save_baseline]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms, args.recall_tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
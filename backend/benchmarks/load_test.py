@@ -0,0 +1,356 @@
+"""
+End-to-end load test of the chat API.
+
+Starts benchmarks/mock_llm_server.py and a uvicorn worker wired to it (with a
+throwaway user database), signs up --users users, then keeps --concurrency
+clients asking questions until --requests answers (or --duration seconds).
+Questions come from a built-in list, a text file, or are replayed from the
+chat_history table of a real database. A share of the requests (--stream-ratio)
+goes to the streaming endpoint, which is timed to its first token and to the
+end of the answer.
+
+The app is started with the semantic answer cache and request coalescing
+(single-flight) turned off, so every question reaches the (mock) model and its
+queues; --with-caches turns them back on. Answers the app reports as cached are
+timed apart from the rest (chat_cached, stream_cached).
+
+Reported per stage (signup, login, chat, chat_cached, stream_first_token,
+stream_total, stream_cached): count, errors by status, throughput and
+p50/p95/p99 latency; --json saves the report together with the app's
+/api/metrics for comparing releases.
+
+Run from the directory the API runs in (it needs the same .env and store):
+
+    python benchmarks/load_test.py --requests 500 --concurrency 32
+    python benchmarks/load_test.py --history sqlite:///./study_abroad.db --stream-ratio 0.5 --json load.json
+    python benchmarks/load_test.py --latency 1.0 --tokens-per-second 20 --env OLLAMA_MAX_CONCURRENCY=4
+    python benchmarks/load_test.py --url http://127.0.0.1:8000      # an API that is already running
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from mock_llm_server import MockLLMServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUESTIONS = [
+    ("What are the student visa requirements?", "USA"),
+    ("How much are tuition fees for a master's degree?", "UK"),
+    ("Can international students work while studying?", "Canada"),
+    ("What English test scores do universities accept?", "Australia"),
+    ("How do I show proof of funds for my visa application?", "Canada"),
+    ("What are the application deadlines for fall intake?", "USA"),
+    ("Is health insurance mandatory for international students?", "Australia"),
+    ("What is the post-study work visa?", "UK"),
+    ("How long does visa processing take?", None),
+    ("Which scholarships are available for international students?", None),
+]
+
+STAGES = ["signup", "login", "chat", "chat_cached", "stream_first_token", "stream_total", "stream_cached"]
+
+
+class StageStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors: Counter = Counter()
+
+    def record(self, seconds: float, status: Optional[str] = None) -> None:
+        if status is None:
+            self.latencies.append(seconds)
+        else:
+            self.errors[status] += 1
+
+    def report(self, wall_seconds: float) -> Dict:
+        latencies = np.asarray(self.latencies, dtype=np.float64)
+        report = {
+            "count": len(latencies),
+            "errors": sum(self.errors.values()),
+            "errors_by_status": dict(self.errors),
+            "throughput_per_second": len(latencies) / wall_seconds if wall_seconds > 0 else 0.0,
+        }
+        for q in (50, 95, 99):
+            report[f"p{q}_seconds"] = float(np.percentile(latencies, q)) if len(latencies) else None
+        report["mean_seconds"] = float(latencies.mean()) if len(latencies) else None
+        return report
+
+
+def load_history(database_url: str, limit: int) -> List[tuple]:
+    """(question, country) pairs from chat_history, most recent first"""
+    from sqlalchemy import create_engine, text
+    engine = create_engine(database_url)
+    with engine.connect() as connection:
+        rows = connection.execute(
+            text("SELECT question, country FROM chat_history ORDER BY created_at DESC LIMIT :limit"),
+            {"limit": limit}
+        ).fetchall()
+    engine.dispose()
+    return [(question, country or None) for question, country in rows]
+
+
+def load_questions(args) -> List[tuple]:
+    if args.history:
+        questions = load_history(args.history, args.history_limit)
+        if not questions:
+            raise SystemExit(f"No questions in chat_history of {args.history}")
+        return questions
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            return [(line.strip(), args.country) for line in f if line.strip()]
+    return QUESTIONS
+
+
+def _status(error: Exception) -> str:
+    if isinstance(error, httpx.HTTPStatusError):
+        return str(error.response.status_code)
+    return type(error).__name__
+
+
+class LoadTest:
+    def __init__(self, base_url: str, args, questions: List[tuple]):
+        self.base_url = base_url
+        self.args = args
+        self.questions = questions
+        self.stages = {stage: StageStats() for stage in STAGES}
+        self.random = random.Random(args.seed)
+        self.issued = 0
+        self.deadline = 0.0
+
+    async def _timed(self, stage: str, request, cached_stage: Optional[str] = None):
+        """Time a request under stage, or under cached_stage if the response says it was cached"""
+        started = time.perf_counter()
+        try:
+            response = await request
+            response.raise_for_status()
+        except Exception as e:
+            self.stages[stage].record(0.0, _status(e))
+            return None
+        elapsed = time.perf_counter() - started
+        if cached_stage is not None and response.json().get("cached"):
+            stage = cached_stage
+        self.stages[stage].record(elapsed)
+        return response
+
+    async def sign_in(self, client: httpx.AsyncClient) -> List[str]:
+        """Sign up and log in the test users; returns their bearer tokens"""
+        run = uuid.uuid4().hex[:8]
+        tokens = []
+        for i in range(self.args.users):
+            credentials = {"email": f"load-{run}-{i}@example.com", "password": "load-test-password"}
+            await self._timed("signup", client.post("/api/auth/signup", json=credentials))
+            response = await self._timed("login", client.post("/api/auth/login", json=credentials))
+            if response is not None:
+                tokens.append(response.json()["access_token"])
+        if not tokens:
+            raise SystemExit("Could not log in any test user")
+        return tokens
+
+    def _next(self) -> Optional[tuple]:
+        if self.args.requests and self.issued >= self.args.requests:
+            return None
+        if self.args.duration and time.perf_counter() >= self.deadline:
+            return None
+        question = self.questions[self.issued % len(self.questions)] if self.args.replay_in_order \
+            else self.random.choice(self.questions)
+        self.issued += 1
+        return question
+
+    async def ask(self, client: httpx.AsyncClient, token: str, question: str, country: Optional[str]) -> None:
+        headers = {"Authorization": f"Bearer {token}"}
+        body = {"question": question, "country": country}
+        if self.random.random() >= self.args.stream_ratio:
+            await self._timed("chat", client.post("/api/chat", json=body, headers=headers), "chat_cached")
+            return
+
+        started = time.perf_counter()
+        first = None
+        event = None
+        cached = False
+        try:
+            async with client.stream("POST", "/api/chat/stream", json=body, headers=headers) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if first is None and line.startswith("data:"):
+                        first = time.perf_counter() - started
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                        if event == "error":
+                            raise RuntimeError("error event")
+                    elif line.startswith("data:") and event == "done":
+                        cached = bool(json.loads(line[len("data:"):]).get("cached"))
+                    elif not line:
+                        event = None
+        except Exception as e:
+            self.stages["stream_total"].record(0.0, _status(e) if not isinstance(e, RuntimeError) else "error_event")
+            return
+        total = time.perf_counter() - started
+        if cached:
+            # A cached answer arrives as one event: its first token and total are the same
+            self.stages["stream_cached"].record(total)
+            return
+        self.stages["stream_first_token"].record(first if first is not None else total)
+        self.stages["stream_total"].record(total)
+
+    async def worker(self, client: httpx.AsyncClient, tokens: List[str], index: int) -> None:
+        token = tokens[index % len(tokens)]
+        while True:
+            question = self._next()
+            if question is None:
+                return
+            await self.ask(client, token, *question)
+
+    async def run(self) -> Dict:
+        limits = httpx.Limits(max_connections=self.args.concurrency + 4, max_keepalive_connections=self.args.concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.args.timeout, limits=limits) as client:
+            tokens = await self.sign_in(client)
+            started = time.perf_counter()
+            self.deadline = started + (self.args.duration or 0)
+            await asyncio.gather(*[self.worker(client, tokens, i) for i in range(self.args.concurrency)])
+            wall = time.perf_counter() - started
+
+            try:
+                metrics = (await client.get("/api/metrics")).json()
+            except Exception:
+                metrics = None
+
+        return {
+            "wall_seconds": wall,
+            "requests": self.issued,
+            "throughput_per_second": self.issued / wall if wall > 0 else 0.0,
+            "stages": {stage: stats.report(wall) for stage, stats in self.stages.items()},
+            "app_metrics": metrics,
+        }
+
+
+def start_app(port: int, env: Dict[str, str], timeout: float) -> subprocess.Popen:
+    """Start a uvicorn worker and wait until GET /ready says it is warm"""
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if app.poll() is not None:
+            raise SystemExit("The API exited during startup")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1.0).status_code == 200:
+                return app
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    app.terminate()
+    raise SystemExit(f"The API was not ready after {timeout}s")
+
+
+def app_env(args, mock: MockLLMServer, database_path: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get("PYTHONPATH")]))
+    env.setdefault("SECRET_KEY", "load-test-secret")
+    env.update({
+        "AI_PROVIDER": args.provider,
+        "PROVIDER_ORDER": "",
+        "OLLAMA_URL": f"{mock.url}/api/generate",
+        "GEMINI_API_URL": mock.url + "/models/{model}:{method}",
+        "GEMINI_API_KEY": "load-test",
+        "DATABASE_URL": f"sqlite:///{database_path}",
+        # Otherwise repeated questions are answered from the caches and never load the model
+        "SEMANTIC_CACHE_ENABLED": "true" if args.with_caches else "false",
+        "SINGLE_FLIGHT_ENABLED": "true" if args.with_caches else "false",
+    })
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+def print_report(report: Dict) -> None:
+    print(f"{report['requests']} questions in {report['wall_seconds']:.1f}s "
+          f"({report['throughput_per_second']:.1f}/s)")
+    print(f"{'stage':<20}{'count':>7}{'errors':>8}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for stage, stats in report["stages"].items():
+        if not stats["count"] and not stats["errors"]:
+            continue
+        cells = [f"{stats[key]:.3f}" if stats[key] is not None else "-"
+                 for key in ("p50_seconds", "p95_seconds", "p99_seconds")]
+        print(f"{stage:<20}{stats['count']:>7}{stats['errors']:>8}{stats['throughput_per_second']:>8.1f}"
+              + "".join(f"{cell:>9}" for cell in cells))
+        if stats["errors_by_status"]:
+            print(f"{'':<20}errors: {stats['errors_by_status']}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Load test /api/chat against a mock LLM server")
+    parser.add_argument("--users", type=int, default=8, help="test users to sign up")
+    parser.add_argument("--concurrency", type=int, default=16, help="clients asking at the same time")
+    parser.add_argument("--requests", type=int, default=200, help="questions to ask (0 = until --duration)")
+    parser.add_argument("--duration", type=float, default=0.0, help="seconds to run (0 = until --requests)")
+    parser.add_argument("--stream-ratio", type=float, default=0.0, help="share of questions sent to /api/chat/stream")
+    parser.add_argument("--history", help="database URL whose chat_history questions are replayed")
+    parser.add_argument("--history-limit", type=int, default=1000, help="most recent questions to replay")
+    parser.add_argument("--questions", help="text file with one question per line")
+    parser.add_argument("--country", help="country for questions from --questions")
+    parser.add_argument("--replay-in-order", action="store_true", help="ask questions in order instead of at random")
+    parser.add_argument("--provider", default="ollama", help="AI_PROVIDER of the app (ollama, gemini, extractive)")
+    parser.add_argument("--with-caches", action="store_true",
+                        help="keep the app's semantic cache and single-flight on (ignored with --url)")
+    parser.add_argument("--latency", type=float, default=0.2, help="mock LLM seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="mock LLM generation speed")
+    parser.add_argument("--answer-tokens", type=int, default=60, help="mock LLM tokens per answer")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=0.0, help="mock LLM prompt speed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of mock LLM requests that fail")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra app setting")
+    parser.add_argument("--url", help="test an API that is already running instead of starting one")
+    parser.add_argument("--port", type=int, default=8765, help="port for the API started by the test")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds per request")
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+    if not args.requests and not args.duration:
+        parser.error("set --requests or --duration")
+
+    questions = load_questions(args)
+    mock = app = None
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            if args.url:
+                base_url = args.url.rstrip("/")
+            else:
+                mock = MockLLMServer(0, args.latency, args.tokens_per_second, args.answer_tokens,
+                                     args.prefill_tokens_per_second, args.error_rate, args.seed).start()
+                app = start_app(args.port, app_env(args, mock, os.path.join(tmp, "load_test.db")),
+                                args.startup_timeout)
+                base_url = f"http://127.0.0.1:{args.port}"
+
+            report = asyncio.run(LoadTest(base_url, args, questions).run())
+        finally:
+            if app is not None:
+                app.terminate()
+                app.wait(timeout=10)
+            if mock is not None:
+                mock.stop()
+
+    report["config"] = {key: value for key, value in vars(args).items() if key != "json"}
+    report["questions"] = len(questions)
+    if mock is not None:
+        report["mock_llm"] = dict(mock.counts)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Local stand-in for the Ollama and Gemini HTTP APIs, for load tests without a GPU or API quota.
+
+Answers are produced at a configurable pace: a fixed latency before the first
+token (queueing and prefill), plus prompt-length-dependent prefill, then
+answer_tokens tokens at tokens_per_second, streamed or all at once like the
+real APIs. A fraction of requests can be made to fail with HTTP 500.
+
+    Ollama: POST /api/generate (stream true/false, returns a `context` token array)
+    Gemini: POST /models/{model}:generateContent
+            POST /models/{model}:streamGenerateContent?alt=sse
+            GET  /models/{model} (metadata, used for warmup)
+    Stats:  GET  /stats (request counts)
+
+Point the app at it with
+
+    OLLAMA_URL=http://127.0.0.1:11500/api/generate
+    GEMINI_API_URL=http://127.0.0.1:11500/models/{model}:{method}
+
+    python benchmarks/mock_llm_server.py --port 11500 --latency 0.3 --tokens-per-second 40
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional
+
+WORDS = ("students need a valid visa proof of funds and an offer letter from a recognised university "
+         "before applying tuition fees vary by program and living costs depend on the city").split()
+
+# Prompt characters per token, as estimated by the app (context_builder.CHARS_PER_TOKEN)
+CHARS_PER_TOKEN = 4
+
+
+class MockLLMServer:
+    """Threaded HTTP server speaking enough of the Ollama and Gemini APIs for the app"""
+
+    def __init__(
+            self,
+            port: int = 0,
+            latency: float = 0.2,
+            tokens_per_second: float = 50.0,
+            answer_tokens: int = 60,
+            prefill_tokens_per_second: float = 0.0,
+            error_rate: float = 0.0,
+            seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.counts: Dict[str, int] = {"ollama": 0, "gemini": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+    def _fails(self) -> bool:
+        with self._lock:
+            return self.random.random() < self.error_rate
+
+    def _tokens(self, prompt: str) -> Iterator[str]:
+        """Answer tokens, paced like a model: first-token delay, then tokens_per_second"""
+        delay = self.latency
+        if self.prefill_tokens_per_second > 0:
+            delay += len(prompt) / CHARS_PER_TOKEN / self.prefill_tokens_per_second
+        time.sleep(delay)
+        interval = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        for i in range(self.answer_tokens):
+            if i and interval:
+                time.sleep(interval)
+            yield WORDS[i % len(WORDS)] + " "
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code: int, body: bytes, content_type: str = "application/json") -> None:
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_chunked(self, parts: Iterator[bytes], content_type: str) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for part in parts:
+                    self.wfile.write(f"{len(part):x}\r\n".encode() + part + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_GET(self):
+                if self.path == "/stats":
+                    self._send(200, json.dumps(server.counts).encode())
+                elif self.path.startswith("/models/"):
+                    self._send(200, json.dumps({"name": self.path.split("?")[0][1:]}).encode())
+                else:
+                    self._send(404, b"{}")
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path.startswith("/api/generate"):
+                    self._ollama(body)
+                elif "Content" in self.path:
+                    self._gemini(body, stream="streamGenerateContent" in self.path)
+                else:
+                    self._send(404, b"{}")
+
+            def _ollama(self, body: dict) -> None:
+                server._count("ollama")
+                prompt = body.get("prompt", "")
+                if not prompt:
+                    # Model load request (warmup)
+                    self._send(200, json.dumps({"response": "", "done": True}).encode())
+                    return
+                if server._fails():
+                    server._count("errors")
+                    self._send(500, json.dumps({"error": "mock failure"}).encode())
+                    return
+                # A continued conversation resumes from its context; new tokens are appended
+                context = list(body.get("context") or [])
+                context.extend(range(len(prompt) // CHARS_PER_TOKEN + server.answer_tokens))
+                if body.get("stream", True):
+                    def parts():
+                        for token in server._tokens(prompt):
+                            yield json.dumps({"response": token, "done": False}).encode() + b"\n"
+                        yield json.dumps({"response": "", "done": True, "context": context}).encode() + b"\n"
+                    self._send_chunked(parts(), "application/x-ndjson")
+                else:
+                    answer = "".join(server._tokens(prompt)).strip()
+                    self._send(200, json.dumps({"response": answer, "done": True, "context": context}).encode())
+
+            def _gemini(self, body: dict, stream: bool) -> None:
+                server._count("gemini")
+                if server._fails():
+                    server._count("errors")
+                    self._send(500, json.dumps({"error": {"message": "mock failure"}}).encode())
+                    return
+                contents = body.get("contents") or [{}]
+                prompt = "".join(part.get("text", "") for part in contents[0].get("parts", []))
+
+                def result(text: str) -> dict:
+                    return {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+
+                if stream:
+                    def parts():
+                        for token in server._tokens(prompt):
+                            yield b"data: " + json.dumps(result(token)).encode() + b"\r\n\r\n"
+                    self._send_chunked(parts(), "text/event-stream")
+                else:
+                    answer = "".join(server._tokens(prompt)).strip()
+                    self._send(200, json.dumps(result(answer)).encode())
+
+        return Handler
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Mock Ollama / Gemini HTTP server with configurable pacing")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="generation speed (0 = instant)")
+    parser.add_argument("--answer-tokens", type=int, default=60, help="tokens per answer")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=0.0,
+                        help="prompt processing speed, adds prompt-length-dependent delay (0 = none)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    args = parser.parse_args(argv)
+
+    server = MockLLMServer(args.port, args.latency, args.tokens_per_second, args.answer_tokens,
+                           args.prefill_tokens_per_second, args.error_rate)
+    print(f"Mock LLM server on {server.url} (Ollama: {server.url}/api/generate, "
+          f"Gemini: {server.url}/models/{{model}}:{{method}})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
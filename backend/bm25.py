@@ -0,0 +1,212 @@
+"""
+In-memory BM25 inverted index over the text chunks.
+
+Postings are stored CSR-style in flat NumPy arrays (one slice per term), and
+each posting already holds its BM25 weight, since with a fixed corpus the
+term-frequency and length normalization do not depend on the query. Scoring a
+query therefore only reads the posting lists of its own terms. Raw term
+frequencies and document lengths are kept too, so new chunks can be merged in
+(extend) without re-tokenizing the existing ones.
+
+The index is persisted next to the embeddings inside the binary store:
+
+    bm25.json         vocabulary, parameters and the store generation it was built from
+    bm25_offsets.i64  int64 start of each term's postings (n_terms + 1 entries)
+    bm25_docs.i32     int32 document rows, grouped by term
+    bm25_weights.f32  float32 BM25 weight of each posting
+    bm25_tfs.f32      float32 term frequency of each posting
+    bm25_lengths.f32  float32 token count of each document
+"""
+import json
+import os
+from collections import Counter
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from embedding_store import open_array, write_array
+from local_embedder import TOKEN_PATTERN
+
+BM25_META_FILE = "bm25.json"
+BM25_OFFSETS_FILE = "bm25_offsets.i64"
+BM25_DOCS_FILE = "bm25_docs.i32"
+BM25_WEIGHTS_FILE = "bm25_weights.f32"
+BM25_TFS_FILE = "bm25_tfs.f32"
+BM25_LENGTHS_FILE = "bm25_lengths.f32"
+
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _tokenize_postings(texts: Sequence[str], vocab: dict, first_row: int = 0):
+    """(term ids, document rows, term frequencies, document lengths) for a batch of chunks"""
+    term_ids: List[np.ndarray] = []
+    tfs: List[np.ndarray] = []
+    doc_lengths = np.zeros(len(texts), dtype=np.float32)
+
+    for i, text in enumerate(texts):
+        tokens = tokenize(text)
+        doc_lengths[i] = len(tokens)
+        counts = Counter(vocab.setdefault(token, len(vocab)) for token in tokens)
+        term_ids.append(np.fromiter(counts.keys(), dtype=np.int64, count=len(counts)))
+        tfs.append(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+
+    lengths = np.array([len(t) for t in term_ids], dtype=np.int64)
+    terms = np.concatenate(term_ids) if term_ids else np.empty(0, dtype=np.int64)
+    tf = np.concatenate(tfs) if tfs else np.empty(0, dtype=np.float32)
+    docs = np.repeat(np.arange(first_row, first_row + len(texts), dtype=np.int32), lengths)
+    return terms, docs, tf, doc_lengths
+
+
+class BM25Index:
+    def __init__(self, vocab: dict, offsets: np.ndarray, docs: np.ndarray, weights: np.ndarray,
+                 tfs: np.ndarray, doc_lengths: np.ndarray, generation: int = 0):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.docs = docs
+        self.weights = weights
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.generation = generation
+
+    @property
+    def count(self) -> int:
+        return len(self.doc_lengths)
+
+    @classmethod
+    def _from_postings(cls, vocab: dict, terms: np.ndarray, docs: np.ndarray, tf: np.ndarray,
+                       doc_lengths: np.ndarray, generation: int, k1: float = K1, b: float = B) -> "BM25Index":
+        """Lay out postings term by term and precompute their BM25 weights"""
+        # The stable sort keeps documents ascending within a term
+        order = np.argsort(terms, kind="stable")
+        terms, tf, docs = terms[order], tf[order], docs[order]
+
+        df = np.bincount(terms, minlength=len(vocab)).astype(np.float32)
+        offsets = np.concatenate(([0], np.cumsum(df))).astype(np.int64)
+
+        # Deleted rows are indexed as empty documents: they count towards neither N nor the average length
+        lengths = doc_lengths[doc_lengths > 0]
+        idf = np.log1p((len(lengths) - df + 0.5) / (df + 0.5))
+        avg_length = float(lengths.mean()) if len(lengths) else 1.0
+        norm = k1 * (1 - b + b * doc_lengths[docs] / avg_length)
+        weights = (idf[terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+        return cls(vocab, offsets, docs, weights, tf, doc_lengths, generation)
+
+    @classmethod
+    def build(cls, texts: Sequence[str], generation: int = 0) -> "BM25Index":
+        """Tokenize every chunk once and build the postings"""
+        vocab = {}
+        terms, docs, tf, doc_lengths = _tokenize_postings(texts, vocab)
+        return cls._from_postings(vocab, terms, docs, tf, doc_lengths, generation)
+
+    def extend(self, texts: Sequence[str], generation: int) -> "BM25Index":
+        """
+        Return a new index with chunks appended as rows count, count + 1, ...
+        Only the new chunks are tokenized; idf and length normalization are
+        recomputed over all postings with array operations.
+        """
+        vocab = dict(self.vocab)
+        terms, docs, tf, doc_lengths = _tokenize_postings(texts, vocab, first_row=self.count)
+
+        old_terms = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        return self._from_postings(
+            vocab,
+            np.concatenate([old_terms, terms]),
+            np.concatenate([self.docs, docs]),
+            np.concatenate([self.tfs, tf]),
+            np.concatenate([self.doc_lengths, doc_lengths]),
+            generation
+        )
+
+    def search(
+            self,
+            query: str,
+            top_k: int,
+            doc_country_ids: Optional[np.ndarray] = None,
+            country_id: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score documents containing at least one query term.
+        country_id restricts results to rows whose doc_country_ids entry matches it.
+        Returns: (document rows, BM25 scores), best first
+        """
+        term_ids = {self.vocab[token] for token in tokenize(query) if token in self.vocab}
+        if not term_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        slices = [slice(self.offsets[t], self.offsets[t + 1]) for t in term_ids]
+        docs = np.concatenate([self.docs[s] for s in slices])
+        weights = np.concatenate([self.weights[s] for s in slices])
+
+        if country_id is not None:
+            keep = doc_country_ids[docs] == country_id
+            docs, weights = docs[keep], weights[keep]
+
+        candidates, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=weights).astype(np.float32)
+
+        k = min(top_k, len(candidates))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return candidates[top].astype(np.int64), scores[top]
+
+    def save(self, path: str) -> None:
+        """Write the index into a store directory"""
+        write_array(os.path.join(path, BM25_OFFSETS_FILE), self.offsets.astype(np.int64))
+        write_array(os.path.join(path, BM25_DOCS_FILE), self.docs.astype(np.int32))
+        write_array(os.path.join(path, BM25_WEIGHTS_FILE), self.weights.astype(np.float32))
+        write_array(os.path.join(path, BM25_TFS_FILE), self.tfs.astype(np.float32))
+        write_array(os.path.join(path, BM25_LENGTHS_FILE), self.doc_lengths.astype(np.float32))
+
+        terms = sorted(self.vocab, key=self.vocab.get)
+        meta = {"count": self.count, "generation": self.generation, "terms": terms}
+        tmp_path = os.path.join(path, BM25_META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(path, BM25_META_FILE))
+
+    @classmethod
+    def load(cls, path: str, count: int, generation: int) -> Optional["BM25Index"]:
+        """Open a persisted index, or return None if it is missing or was built from other data"""
+        meta_path = os.path.join(path, BM25_META_FILE)
+        files = (BM25_OFFSETS_FILE, BM25_DOCS_FILE, BM25_WEIGHTS_FILE, BM25_TFS_FILE, BM25_LENGTHS_FILE)
+        if not os.path.isfile(meta_path) or not all(os.path.isfile(os.path.join(path, f)) for f in files):
+            return None
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["count"] != count or meta["generation"] != generation:
+            return None
+
+        # Postings are memory-mapped, so worker processes share one copy in the page cache
+        vocab = {term: i for i, term in enumerate(meta["terms"])}
+        offsets = open_array(os.path.join(path, BM25_OFFSETS_FILE), np.int64, (len(vocab) + 1,))
+        n_postings = (int(offsets[-1]),)
+        docs = open_array(os.path.join(path, BM25_DOCS_FILE), np.int32, n_postings)
+        weights = open_array(os.path.join(path, BM25_WEIGHTS_FILE), np.float32, n_postings)
+        tfs = open_array(os.path.join(path, BM25_TFS_FILE), np.float32, n_postings)
+        doc_lengths = open_array(os.path.join(path, BM25_LENGTHS_FILE), np.float32, (count,))
+        return cls(vocab, offsets, docs, weights, tfs, doc_lengths, generation)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[np.ndarray], k: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fuse several ranked lists of document rows: score(d) = sum 1 / (k + rank of d).
+    Returns: (document rows, fused scores), best first
+    """
+    rows = np.concatenate(rankings)
+    if not len(rows):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    contributions = np.concatenate([1.0 / (k + 1 + np.arange(len(r))) for r in rankings])
+    candidates, inverse = np.unique(rows, return_inverse=True)
+    scores = np.bincount(inverse, weights=contributions)
+    order = np.argsort(-scores, kind="stable")
+    return candidates[order], scores[order].astype(np.float32)
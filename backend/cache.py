@@ -0,0 +1,180 @@
+"""
+Bounded in-process caches with LRU and TTL eviction.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after ttl_seconds.
+    ttl_seconds <= 0 disables expiry; max_size <= 0 disables the cache.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float = 0, sizeof: Optional[Callable[[Any], int]] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._sizeof = sizeof
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - stored_at > self.ttl_seconds
+
+    def _remove(self, key: Hashable) -> None:
+        value, _ = self._data.pop(key)
+        if self._sizeof is not None:
+            self._nbytes -= self._sizeof(value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, stored_at = entry
+            if self._expired(stored_at, time.time()):
+                self._remove(key)
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, stored_at: Optional[float] = None) -> None:
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, time.time() if stored_at is None else stored_at)
+            if self._sizeof is not None:
+                self._nbytes += self._sizeof(value)
+
+            while len(self._data) > self.max_size:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._nbytes = 0
+
+    def items(self):
+        """Snapshot of (key, value, stored_at) for unexpired entries, oldest first"""
+        now = time.time()
+        with self._lock:
+            return [
+                (key, value, stored_at)
+                for key, (value, stored_at) in self._data.items()
+                if not self._expired(stored_at, now)
+            ]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+        if self._sizeof is not None:
+            stats["nbytes"] = self._nbytes
+        return stats
+
+
+def normalize_query(text: str) -> str:
+    """Cache key form of a question: lowercased with collapsed whitespace"""
+    return " ".join(text.lower().split())
+
+
+class EmbeddingCache(TTLCache):
+    """Query text -> embedding cache that can be saved to and restored from an .npz file"""
+
+    def __init__(self, max_size: int, ttl_seconds: float = 0, path: str = ""):
+        super().__init__(max_size, ttl_seconds, sizeof=lambda v: v.nbytes)
+        self.path = path
+        if path and os.path.isfile(path):
+            self.load(path)
+
+    def get_embedding(self, text: str) -> Optional[np.ndarray]:
+        return self.get(normalize_query(text))
+
+    def put_embedding(self, text: str, embedding: np.ndarray) -> None:
+        self.put(normalize_query(text), np.asarray(embedding, dtype=np.float32))
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write unexpired entries to disk (atomically)"""
+        path = path or self.path
+        if not path:
+            return
+
+        entries = self.items()
+        if not entries:
+            return
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            keys=np.array([key for key, _, _ in entries]),
+            embeddings=np.stack([value for _, value, _ in entries]),
+            stored_at=np.array([stored_at for _, _, stored_at in entries]),
+        )
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> None:
+        """Restore entries saved by save(), skipping ones that have expired since"""
+        try:
+            with np.load(path) as data:
+                for key, embedding, stored_at in zip(data["keys"], data["embeddings"], data["stored_at"]):
+                    if not self._expired(float(stored_at), time.time()):
+                        self.put(str(key), embedding, stored_at=float(stored_at))
+        except Exception as e:
+            print(f"Could not load embedding cache from {path}: {e}")
+
+
+# Rough per-entry bookkeeping (key tuple, dict slot, array headers) added to the array bytes
+RESULT_ENTRY_OVERHEAD = 400
+
+
+class ResultCache(TTLCache):
+    """
+    Ranked (row ids, scores) per retrieval, keyed by index version, search mode,
+    country filter, top_k and the query: a hash of its embedding for vector
+    search, its normalized text for BM25, both for hybrid. The version keeps
+    index snapshots apart; owners also clear() the cache when they swap the index.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float = 0):
+        super().__init__(
+            max_size,
+            ttl_seconds,
+            sizeof=lambda v: v[0].nbytes + v[1].nbytes + RESULT_ENTRY_OVERHEAD
+        )
+
+    @staticmethod
+    def key(version: int, mode: str, country: Optional[str], top_k: int, query: str,
+            query_embedding: Optional[np.ndarray]) -> Tuple:
+        digest = None
+        if query_embedding is not None:
+            data = np.ascontiguousarray(query_embedding, dtype=np.float32).tobytes()
+            digest = hashlib.blake2b(data, digest_size=16).digest()
+        text = normalize_query(query) if mode != "vector" else None
+        return version, mode, (country or "").lower(), top_k, digest, text
@@ -8,13 +8,101 @@ class Settings(BaseSettings):
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     gemini_api_key: str = ""  # Optional if using Ollama
+    gemini_api_url: str = ""  # REST endpoint template with {model} and {method}; empty = Google's API
 
-    # AI Provider: "gemini" or "ollama"
+    # AI Provider: "gemini", "ollama" or "extractive" (no LLM; "simple" is its old name)
     ai_provider: str = "ollama"  # Change to "gemini" to use Gemini API
 
     # Ollama settings
     ollama_url: str = "http://localhost:11434/api/generate"
     ollama_model: str = "llama2"  # or "mistral", "phi", etc.
+    ollama_keep_alive: str = "30m"  # how long Ollama keeps the model loaded after a request ("" = its default)
+
+    # Provider fallback order, e.g. "ollama,gemini"; empty = just ai_provider. The extractive
+    # answer is used when every provider fails, times out or has its circuit open
+    provider_order: str = ""
+    ollama_timeout_seconds: float = 30.0  # latency budget per request
+    gemini_timeout_seconds: float = 20.0
+    circuit_failure_threshold: int = 3  # consecutive failures before a provider is skipped
+    circuit_reset_seconds: float = 30.0  # how long it is skipped before a trial request
+    # Hedging: also ask the next provider once the first is slower than its p95 latency
+    hedge_enabled: bool = False
+    hedge_delay_seconds: float = 5.0  # hedge delay until enough latencies are recorded
+    # Backpressure: concurrent requests per provider, plus a bounded queue behind them. When every
+    # provider's queue is full (or a request waits too long) the API answers 503 with Retry-After
+    ollama_max_concurrency: int = 2
+    gemini_max_concurrency: int = 16
+    llm_queue_size: int = 32  # waiting requests per provider
+    llm_queue_timeout_seconds: float = 10.0  # longest wait for a slot
+
+    # Extractive answers (no LLM): length limits, and whether they answer requests that would
+    # otherwise get 503 because every LLM provider's queue is full
+    extractive_max_sentences: int = 4
+    extractive_max_chars: int = 900
+    extractive_on_overload: bool = True
+
+    # Conversation sessions (ChatRequest.session_id): follow-ups reuse the previous turn's results and
+    # Ollama's returned context. At most session_max_count are kept, each for session_ttl_seconds idle
+    session_max_count: int = 1000
+    session_ttl_seconds: float = 1800
+    session_max_context_tokens: int = 8192  # Ollama context kept per session; longer ones start over
+
+    # Async LLM calls share one pooled HTTP client (keep-alive connections to Ollama / Gemini)
+    llm_timeout_seconds: float = 60.0
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    retrieval_workers: int = 4  # threads running vector search off the event loop
+
+    # Prompt context budget in (estimated) tokens per provider; <= 0 includes every retrieved chunk whole
+    ollama_context_tokens: int = 1500
+    gemini_context_tokens: int = 6000
+
+    # Vector index: "exact" (brute force) or "ivf" (approximate, for large corpora)
+    vector_index: str = "exact"
+    ivf_lists: int = 0  # 0 = about 4 * sqrt(number of chunks)
+    ivf_nprobe: int = 8  # lists scanned per query; higher = better recall, slower
+
+    # Search matrix storage: "float32" or "int8" (4x smaller); with int8,
+    # top_k * vector_rescore_factor candidates are rescored with the full-precision embeddings
+    vector_precision: str = "float32"
+    vector_rescore_factor: int = 4
+    # Publish the prepared index into the store and memory-map it, so all API workers share one copy
+    vector_index_shared: bool = False
+
+    # Retrieval: "vector", "lexical" (BM25) or "hybrid" (reciprocal rank fusion of both)
+    search_mode: str = "hybrid"
+
+    # Maximal marginal relevance: re-rank the best mmr_fetch_k chunks for diversity before building the prompt
+    mmr_enabled: bool = True
+    mmr_fetch_k: int = 30
+    mmr_lambda: float = 0.7  # 1.0 = relevance only, lower = more diverse
+    mmr_max_similarity: float = 0.95  # drop chunks at least this similar to one already picked
+
+    # Index maintenance: admin endpoints are disabled while admin_token is empty
+    admin_token: str = ""
+    vector_store_watch_seconds: int = 0  # > 0 reloads the index when the store changes on disk
+
+    # Query embedding cache (Gemini embeddings), keyed by normalized question text
+    embedding_cache_size: int = 2048
+    embedding_cache_ttl_seconds: int = 86400
+    embedding_cache_path: str = ""  # e.g. "embedding_cache.npz" to persist across restarts
+
+    # Retrieval result cache, keyed by query embedding, country, top_k and mode; cleared on index reloads
+    result_cache_size: int = 1024
+    result_cache_ttl_seconds: int = 3600
+
+    # Semantic answer cache: reuse the answer of an earlier question (same country filter) whose
+    # embedding has at least this cosine similarity; cleared when the index changes
+    semantic_cache_enabled: bool = True
+    semantic_cache_threshold: float = 0.9
+    semantic_cache_size: int = 2048
+    semantic_cache_ttl_seconds: int = 3600
+
+    # Concurrent identical chat requests (same normalized question and country) share one generation
+    single_flight_enabled: bool = True
+
+    # Load the index and warm the providers at startup; GET /ready returns 503 until that is done
+    warmup_enabled: bool = True
 
     # Environment
     environment: str = "development"  # development, staging, production
@@ -33,7 +121,7 @@ def get_settings() -> Settings:
         if settings.secret_key == "change-this-to-a-secure-random-string-in-production":
             raise ValueError("CRITICAL: Must change SECRET_KEY in production!")
 
-        if settings.ai_provider == "gemini":
+        if "gemini" in (settings.provider_order or settings.ai_provider).lower():
             if not settings.gemini_api_key or settings.gemini_api_key == "your-gemini-api-key-here":
                 raise ValueError("CRITICAL: GEMINI_API_KEY must be set when using Gemini!")
 
@@ -0,0 +1,101 @@
+"""
+Token-budgeted context assembly for LLM prompts.
+
+Retrieved chunks are added best score first until the token budget is
+spent. A chunk that does not fit whole is trimmed to its leading sentences
+(so the model never sees half a sentence), and chunks that do not fit at
+all are skipped in favour of smaller ones further down. Prompt size, and
+so prefill time, is then bounded by the budget instead of by how long the
+retrieved chunks happen to be.
+
+Token counts are estimated from text length (CHARS_PER_TOKEN), which is
+close enough for English prose with Llama-style and Gemini tokenizers and
+needs no tokenizer download. VectorSearch precomputes the count of every
+chunk when the index is loaded (see estimate_tokens_from_bytes).
+"""
+import re
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CHARS_PER_TOKEN = 4
+
+# A trimmed chunk must keep at least this many tokens to be worth including
+MIN_TRIM_TOKENS = 32
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text"""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def estimate_tokens_from_bytes(byte_lengths: np.ndarray) -> np.ndarray:
+    """Vectorized estimate for many chunks from their UTF-8 lengths (a slight overestimate for non-ASCII text)"""
+    return ((np.asarray(byte_lengths, dtype=np.int64) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN).astype(np.int32)
+
+
+def chunk_header(country: str) -> str:
+    return f"[From {country}]: "
+
+
+def trim_to_sentences(text: str, max_tokens: int) -> str:
+    """Longest run of leading sentences within max_tokens ("" if even the first is too long)"""
+    kept, used = [], 0
+    for sentence in SENTENCE_END.split(text):
+        tokens = estimate_tokens(sentence) + (1 if kept else 0)
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    return " ".join(kept)
+
+
+def build_context(
+        results: Sequence[Tuple[str, str, float]],
+        max_tokens: int,
+        token_counts: Optional[Sequence[int]] = None
+) -> Tuple[str, int]:
+    """
+    results: (country, text_chunk, score) from VectorSearch
+    max_tokens: context budget; <= 0 joins every chunk whole
+    token_counts: precomputed token count per result (estimated when missing)
+    Returns: (context, estimated tokens used)
+    """
+    if token_counts is None:
+        token_counts = [estimate_tokens(text) for _, text, _ in results]
+    order = sorted(range(len(results)), key=lambda i: -results[i][2])
+
+    parts: List[str] = []
+    used = 0
+    separator = estimate_tokens("\n\n")
+    for i in order:
+        country, text, _ = results[i]
+        header = chunk_header(country)
+        overhead = estimate_tokens(header) + (separator if parts else 0)
+        tokens = int(token_counts[i]) + overhead
+
+        if max_tokens <= 0 or used + tokens <= max_tokens:
+            parts.append(header + text)
+            used += tokens
+            continue
+
+        remaining = max_tokens - used - overhead
+        if remaining < MIN_TRIM_TOKENS:
+            continue
+        trimmed = trim_to_sentences(text, remaining)
+        if trimmed:
+            parts.append(header + trimmed)
+            used += overhead + estimate_tokens(trimmed)
+
+    if not parts and order and max_tokens > 0:
+        # Not even one sentence fits: cut the best chunk at a word boundary instead
+        country, text, _ = results[order[0]]
+        header = chunk_header(country)
+        limit = max(0, (max_tokens - estimate_tokens(header)) * CHARS_PER_TOKEN)
+        cut = text[:limit].rsplit(" ", 1)[0] if len(text) > limit else text
+        parts.append(header + cut)
+        used = estimate_tokens(parts[0])
+
+    return "\n\n".join(parts), used
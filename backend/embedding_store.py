@@ -0,0 +1,327 @@
+"""
+Binary on-disk embedding store.
+
+A store is a directory holding a contiguous float32 matrix plus small sidecar
+files, so it can be opened with ``np.memmap`` without parsing anything:
+
+    meta.json         format version, dimension, row count, country names,
+                      deleted row ranges and (for ingested stores) source documents
+    vectors.f32       float32 matrix, row-major, count x dim
+    country_ids.u16   uint16 index into meta["countries"] for every row
+    text_offsets.i64  int64 byte offsets into texts.utf8 (count + 1 entries)
+    texts.utf8        all text chunks concatenated, UTF-8 encoded
+
+Convert the legacy CSV with:
+
+    python embedding_store.py convert study_abroad_embeddings_local.csv study_abroad_store
+"""
+import argparse
+import json
+import os
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.f32"
+COUNTRY_IDS_FILE = "country_ids.u16"
+TEXT_OFFSETS_FILE = "text_offsets.i64"
+TEXTS_FILE = "texts.utf8"
+
+VECTOR_DTYPE = np.float32
+COUNTRY_ID_DTYPE = np.uint16
+OFFSET_DTYPE = np.int64
+
+
+def is_store(path: str) -> bool:
+    """Return True if path is a directory containing a binary embedding store"""
+    return os.path.isdir(path) and os.path.isfile(os.path.join(path, META_FILE))
+
+
+def read_meta(path: str) -> dict:
+    """Read the metadata sidecar of a store"""
+    with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_meta(path: str, meta: dict) -> None:
+    """Atomically replace the metadata sidecar so readers never see a partial file"""
+    tmp_path = os.path.join(path, META_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, META_FILE))
+
+
+def write_array(path: str, array: np.ndarray) -> None:
+    """
+    Write a raw array file via a temporary file and rename, so processes that
+    have the previous version memory-mapped keep reading consistent data
+    """
+    tmp_path = path + ".tmp"
+    array.tofile(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def open_array(path: str, dtype, shape: tuple) -> np.ndarray:
+    """Memory-map a raw array file read-only (np.memmap cannot map empty files)"""
+    if int(np.prod(shape)) == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+class TextColumn:
+    """Read-only sequence of text chunks backed by the memory-mapped UTF-8 blob"""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return bytes(self._blob[start:end]).decode("utf-8")
+
+    def byte_lengths(self) -> np.ndarray:
+        """UTF-8 length of every chunk, without decoding any text"""
+        return np.diff(self._offsets)
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+class EmbeddingStore:
+    """Read-only view over a binary embedding store"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.meta = read_meta(path)
+
+        if self.meta.get("format_version") != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported embedding store version {self.meta.get('format_version')} in {path}"
+            )
+
+        self.dim = int(self.meta["dim"])
+        self.count = int(self.meta["count"])
+        self.country_names: List[str] = list(self.meta["countries"])
+        self.generation = int(self.meta.get("generation", 0))
+
+        self.vectors = open_array(
+            os.path.join(path, VECTORS_FILE), VECTOR_DTYPE, (self.count, self.dim)
+        )
+        self.country_ids = open_array(
+            os.path.join(path, COUNTRY_IDS_FILE), COUNTRY_ID_DTYPE, (self.count,)
+        )
+        offsets = open_array(
+            os.path.join(path, TEXT_OFFSETS_FILE), OFFSET_DTYPE, (self.count + 1,)
+        )
+        if self.count == 0:
+            offsets = np.zeros(1, dtype=OFFSET_DTYPE)
+        blob = open_array(os.path.join(path, TEXTS_FILE), np.uint8, (int(offsets[-1]),))
+        self.texts = TextColumn(blob, offsets)
+
+    def live_mask(self) -> Optional[np.ndarray]:
+        """Boolean mask of rows that are not deleted, or None when nothing is deleted"""
+        deleted = self.meta.get("deleted") or []
+        if not deleted:
+            return None
+        mask = np.ones(self.count, dtype=bool)
+        for start, end in deleted:
+            mask[start:end] = False
+        return mask
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class StoreWriter:
+    """
+    Append rows to a store, creating it if needed.
+    Data files are appended in place and meta.json is rewritten on close, so
+    readers opening the store concurrently only ever see committed rows.
+    """
+
+    def __init__(self, path: str, dim: Optional[int] = None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+        if is_store(path):
+            self.meta = read_meta(path)
+            if dim is not None and dim != self.meta["dim"]:
+                raise ValueError(f"Dimension mismatch: store has {self.meta['dim']}, got {dim}")
+        else:
+            if dim is None:
+                raise ValueError("dim is required when creating a new embedding store")
+            self.meta = {
+                "format_version": FORMAT_VERSION,
+                "dim": int(dim),
+                "count": 0,
+                "dtype": "float32",
+                "countries": [],
+                "generation": 0,
+            }
+
+        self._truncate_to_meta()
+        # Country names are matched ignoring case; the first spelling written is the one stored
+        self._country_index = {}
+        for i, name in enumerate(self.meta["countries"]):
+            self._country_index.setdefault(name.lower(), i)
+        self._text_end = self._read_text_end()
+
+        self._vectors = open(os.path.join(path, VECTORS_FILE), "ab")
+        self._country_ids = open(os.path.join(path, COUNTRY_IDS_FILE), "ab")
+        self._offsets = open(os.path.join(path, TEXT_OFFSETS_FILE), "ab")
+        self._texts = open(os.path.join(path, TEXTS_FILE), "ab")
+
+        if os.path.getsize(os.path.join(path, TEXT_OFFSETS_FILE)) == 0:
+            self._offsets.write(np.zeros(1, dtype=OFFSET_DTYPE).tobytes())
+
+    def _truncate_to_meta(self) -> None:
+        """Drop bytes left behind by a writer that crashed before committing"""
+        count, dim = self.meta["count"], self.meta["dim"]
+        sizes = {
+            VECTORS_FILE: count * dim * np.dtype(VECTOR_DTYPE).itemsize,
+            COUNTRY_IDS_FILE: count * np.dtype(COUNTRY_ID_DTYPE).itemsize,
+            TEXT_OFFSETS_FILE: (count + 1) * np.dtype(OFFSET_DTYPE).itemsize if count else 0,
+        }
+        for name, size in sizes.items():
+            file_path = os.path.join(self.path, name)
+            if os.path.exists(file_path) and os.path.getsize(file_path) > size:
+                os.truncate(file_path, size)
+
+        texts_path = os.path.join(self.path, TEXTS_FILE)
+        text_end = self._read_text_end()
+        if os.path.exists(texts_path) and os.path.getsize(texts_path) > text_end:
+            os.truncate(texts_path, text_end)
+
+    def _read_text_end(self) -> int:
+        offsets_path = os.path.join(self.path, TEXT_OFFSETS_FILE)
+        if self.meta["count"] == 0 or not os.path.exists(offsets_path):
+            return 0
+        with open(offsets_path, "rb") as f:
+            f.seek(self.meta["count"] * np.dtype(OFFSET_DTYPE).itemsize)
+            return int(np.frombuffer(f.read(np.dtype(OFFSET_DTYPE).itemsize), dtype=OFFSET_DTYPE)[0])
+
+    def _country_id(self, country: str) -> int:
+        key = country.lower()
+        if key not in self._country_index:
+            self._country_index[key] = len(self.meta["countries"])
+            self.meta["countries"].append(country)
+        return self._country_index[key]
+
+    def add_batch(self, countries: Sequence[str], texts: Sequence[str], vectors: np.ndarray) -> None:
+        """Append a batch of rows"""
+        vectors = np.ascontiguousarray(vectors, dtype=VECTOR_DTYPE)
+        if vectors.ndim != 2 or vectors.shape[1] != self.meta["dim"]:
+            raise ValueError(f"Expected vectors of shape (n, {self.meta['dim']}), got {vectors.shape}")
+        if not (len(countries) == len(texts) == len(vectors)):
+            raise ValueError("countries, texts and vectors must have the same length")
+
+        encoded = [text.encode("utf-8") for text in texts]
+        lengths = np.fromiter((len(b) for b in encoded), dtype=OFFSET_DTYPE, count=len(encoded))
+        offsets = self._text_end + np.cumsum(lengths)
+        ids = np.fromiter((self._country_id(c) for c in countries), dtype=COUNTRY_ID_DTYPE, count=len(countries))
+
+        self._vectors.write(vectors.tobytes())
+        self._country_ids.write(ids.tobytes())
+        self._offsets.write(offsets.astype(OFFSET_DTYPE).tobytes())
+        self._texts.write(b"".join(encoded))
+
+        if len(offsets):
+            self._text_end = int(offsets[-1])
+        self.meta["count"] += len(vectors)
+
+    def delete_rows(self, start: int, end: int) -> None:
+        """Mark rows [start, end) as deleted; readers skip them from the next commit on"""
+        if end > start:
+            self.meta.setdefault("deleted", []).append([int(start), int(end)])
+
+    def commit(self) -> None:
+        """Flush data files and publish the new row count (and any meta changes)"""
+        for f in (self._vectors, self._country_ids, self._offsets, self._texts):
+            f.flush()
+            os.fsync(f.fileno())
+        self.meta["generation"] = int(self.meta.get("generation", 0)) + 1
+        _write_meta(self.path, self.meta)
+
+    def close(self) -> None:
+        """Commit and close the data files"""
+        self.commit()
+        for f in (self._vectors, self._country_ids, self._offsets, self._texts):
+            f.close()
+
+    def abort(self) -> None:
+        """Close without committing; uncommitted bytes are truncated by the next writer"""
+        for f in (self._vectors, self._country_ids, self._offsets, self._texts):
+            f.close()
+
+    def __enter__(self) -> "StoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _iter_csv_batches(csv_path: str, batch_size: int) -> Iterable[tuple]:
+    """Stream (countries, texts, vectors) batches out of the legacy CSV"""
+    import pandas as pd
+
+    for chunk in pd.read_csv(csv_path, chunksize=batch_size):
+        vectors = np.array(
+            [json.loads(x) if isinstance(x, str) else x for x in chunk["embedding"]],
+            dtype=VECTOR_DTYPE,
+        )
+        yield chunk["country"].astype(str).tolist(), chunk["text_chunk"].astype(str).tolist(), vectors
+
+
+def convert_csv(csv_path: str, store_path: str, batch_size: int = 1000) -> int:
+    """Convert a country,text_chunk,embedding CSV into a binary store. Returns the row count."""
+    if is_store(store_path):
+        raise FileExistsError(f"Embedding store already exists at {store_path}")
+
+    writer = None
+    try:
+        for countries, texts, vectors in _iter_csv_batches(csv_path, batch_size):
+            if writer is None:
+                writer = StoreWriter(store_path, dim=vectors.shape[1])
+            writer.add_batch(countries, texts, vectors)
+    except Exception:
+        if writer is not None:
+            writer.abort()
+        raise
+
+    if writer is None:
+        return 0
+    writer.close()
+    return writer.meta["count"]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Manage binary embedding stores")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="Convert the legacy embeddings CSV")
+    convert.add_argument("csv_path")
+    convert.add_argument("store_path")
+    convert.add_argument("--batch-size", type=int, default=1000)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        count = convert_csv(args.csv_path, args.store_path, batch_size=args.batch_size)
+        print(f"Wrote {count} document chunks to {args.store_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Extractive answering: a short, cited answer built from the retrieved chunks without an LLM.
+
+The chunks are split into sentences and every sentence is scored against the
+question in one batch:
+
+- lexical similarity: cosine of the hashed word / bigram / character-trigram
+  features (local_embedder.sparse_features), so sentences sharing the question's
+  terms, or spelling variants of them, score high;
+- semantic similarity: the same features projected into the document
+  embedding space by the offline query embedder, when the index has one;
+- a prior from the retrieval score of the chunk the sentence came from.
+
+The best sentences are picked greedily, skipping near-duplicates of ones
+already picked, then put back in document order and cited with [n] markers
+pointing at the source guides. A typical answer over ten chunks takes a few
+milliseconds, so it serves as the no-LLM provider ("extractive"), as the
+fallback when every LLM fails and as the answer of last resort when the LLM
+queues are full.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from context_builder import SENTENCE_END
+from local_embedder import N_FEATURES, sparse_features
+
+# Only the best-ranked chunks are mined for sentences; the rest rarely win and cost featurizing
+MAX_CANDIDATE_CHUNKS = 6
+
+# Sentences shorter than this are headings or fragments, longer ones are cut
+MIN_SENTENCE_CHARS = 25
+MAX_SENTENCE_CHARS = 400
+
+LEXICAL_WEIGHT = 0.6
+SEMANTIC_WEIGHT = 0.4
+CHUNK_PRIOR_WEIGHT = 0.2
+
+# A candidate this similar (lexically) to a picked sentence adds nothing new
+REDUNDANCY_THRESHOLD = 0.8
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences of a chunk worth quoting, whitespace-normalized"""
+    sentences = []
+    for line in text.splitlines():
+        for sentence in SENTENCE_END.split(line):
+            sentence = " ".join(sentence.split())
+            if len(sentence) < MIN_SENTENCE_CHARS:
+                continue
+            if len(sentence) > MAX_SENTENCE_CHARS:
+                sentence = sentence[:MAX_SENTENCE_CHARS].rsplit(" ", 1)[0] + "..."
+            sentences.append(sentence)
+    return sentences
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class ExtractiveAnswerer:
+    """Select and cite the sentences of the retrieved chunks that best answer a question"""
+
+    def __init__(self, max_sentences: int = 4, max_chars: int = 900):
+        self.max_sentences = max_sentences
+        self.max_chars = max_chars
+
+    def score(self, question: str, sentences: Sequence[str], embedder=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Similarity of each sentence to the question.
+        Returns: (scores, L2-normalized sentence feature matrix)
+        """
+        # Each text is featurized once; the sparse rows feed both similarities
+        sparse = [sparse_features(text) for text in (question, *sentences)]
+        features = np.zeros((len(sparse), N_FEATURES), dtype=np.float32)
+        for i, (indices, values) in enumerate(sparse):
+            features[i, indices] = values
+        query, rows = features[0], features[1:]
+        scores = rows @ query
+        if embedder is not None:
+            embedded = _normalize_rows(np.array([embedder.encode_sparse(*row) for row in sparse]))
+            scores = LEXICAL_WEIGHT * scores + SEMANTIC_WEIGHT * (embedded[1:] @ embedded[0])
+        return scores, rows
+
+    def select(self, scores: np.ndarray, features: np.ndarray) -> List[int]:
+        """Indices of the best sentences (at most max_sentences), skipping near-duplicates of better ones"""
+        picked: List[int] = []
+        for i in np.argsort(-scores, kind="stable"):
+            if len(picked) >= self.max_sentences:
+                break
+            if picked and float(np.max(features[picked] @ features[i])) >= REDUNDANCY_THRESHOLD:
+                continue
+            picked.append(int(i))
+        return picked
+
+    def answer(self, question: str, country: Optional[str], search_results, embedder=None) -> str:
+        """
+        search_results: (country, text_chunk, score) from VectorSearch
+        embedder: the index's LocalEmbedder, for semantic scoring (lexical only when None)
+        """
+        sentences: List[str] = []
+        chunk_of: List[int] = []
+        search_results = search_results[:MAX_CANDIDATE_CHUNKS]
+        for chunk, (_, text, _) in enumerate(search_results):
+            for sentence in split_sentences(text):
+                sentences.append(sentence)
+                chunk_of.append(chunk)
+        country_filter = f" about {country}" if country else ""
+        if not sentences:
+            best_country, best_text, _ = search_results[0]
+            return (f"Based on the study abroad information{country_filter}:\n\n"
+                    f"{best_text[:self.max_chars]}\n\nSource: {best_country} Study Abroad Guide")
+
+        chunk_of = np.asarray(chunk_of)
+        chunk_scores = np.array([score for _, _, score in search_results], dtype=np.float32)
+        top = float(chunk_scores.max())
+        prior = chunk_scores / top if top > 0 else np.zeros_like(chunk_scores)
+
+        scores, features = self.score(question, sentences, embedder)
+        scores = scores + CHUNK_PRIOR_WEIGHT * prior[chunk_of]
+
+        # Trim the selection to max_chars, always keeping the best sentence
+        picked, length = [], 0
+        for i in self.select(scores, features):
+            if picked and length + len(sentences[i]) > self.max_chars:
+                continue
+            picked.append(i)
+            length += len(sentences[i]) + 1
+        # Read in document order: by source chunk rank, then position within the chunk
+        picked.sort()
+
+        citations: Dict[int, int] = {}
+        sources: List[str] = []
+        parts = []
+        for i in picked:
+            chunk = int(chunk_of[i])
+            if chunk not in citations:
+                source = f"{search_results[chunk][0]} Study Abroad Guide"
+                if source not in sources:
+                    sources.append(source)
+                citations[chunk] = sources.index(source) + 1
+            parts.append(f"{sentences[i]} [{citations[chunk]}]")
+
+        references = "\n".join(f"[{n}] {source}" for n, source in enumerate(sources, 1))
+        return (f"Based on the study abroad information{country_filter}:\n\n"
+                + " ".join(parts) + f"\n\nSources:\n{references}")
@@ -0,0 +1,40 @@
+"""
+Shared async HTTP client for LLM provider calls.
+
+One httpx.AsyncClient per event loop keeps a pool of keep-alive connections
+to Ollama and the Gemini API, so requests skip the TCP/TLS handshake.
+"""
+import asyncio
+from typing import Optional
+
+import httpx
+
+from config import get_settings
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get or create the pooled client for the running event loop"""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop or _client.is_closed:
+        settings = get_settings()
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.llm_timeout_seconds, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections
+            )
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close pooled connections (on application shutdown)"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
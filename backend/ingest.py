@@ -0,0 +1,332 @@
+"""
+Ingest source documents into the binary embedding store.
+
+Documents are read from a directory laid out as SOURCE_DIR/<Country>/*.txt|*.md
+(or any directory with --country), split into overlapping word chunks,
+embedded in batches across a process pool and appended to the store that
+VectorSearch loads:
+
+    python ingest.py guides/ study_abroad_store --embedder gemini
+    python ingest.py guides/usa/ study_abroad_store --country USA --chunk-size 400 --overlap 40
+
+Every document is recorded in meta["sources"] with its SHA-256 and row range,
+committed together with its rows, so re-running the command only embeds new or
+changed documents and an interrupted run resumes from its last commit. Rows of a
+changed (or, with --prune, removed) document are marked deleted rather than
+rewritten. Memory use is bounded by the number of batches in flight, not by
+the corpus size.
+
+The store has a single writer: do not run two ingests (or an ingest and
+POST /api/admin/documents) against the same store at once.
+"""
+import argparse
+import hashlib
+import itertools
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from embedding_store import StoreWriter, is_store
+
+SOURCE_EXTENSIONS = (".txt", ".md")
+
+DEFAULT_CHUNK_SIZE = 500  # words
+DEFAULT_OVERLAP = 50  # words
+DEFAULT_BATCH_SIZE = 32  # chunks per embedding call
+DEFAULT_COMMIT_EVERY = 2048  # chunks between store commits
+
+GEMINI_EMBEDDING_MODEL = "models/embedding-001"
+EMBED_RETRIES = 3
+
+# Per-process embedder, set up by _init_worker
+_worker_embed = None
+
+
+def iter_documents(source_dir: str, country: Optional[str] = None) -> Iterator[Tuple[str, str, str]]:
+    """
+    Yield (source key, country, file path) for every document, in a stable order.
+    Without country, the first directory level below source_dir names the country.
+    """
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.lower().endswith(SOURCE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            key = os.path.relpath(path, source_dir).replace(os.sep, "/")
+            if country is not None:
+                yield key, country, path
+            elif "/" in key:
+                yield key, key.split("/", 1)[0], path
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_chunks(path: str, chunk_size: int, overlap: int) -> Iterator[str]:
+    """Stream a document as chunks of chunk_size words, consecutive chunks sharing overlap words"""
+    words: List[str] = []
+    new_words = 0
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            for word in line.split():
+                words.append(word)
+                new_words += 1
+                if len(words) == chunk_size:
+                    yield " ".join(words)
+                    words = words[chunk_size - overlap:]
+                    new_words = 0
+    if new_words:
+        yield " ".join(words)
+
+
+def _init_worker(embedder: str, store_path: str, api_key: str) -> None:
+    """Set up the embedding function once per worker process"""
+    global _worker_embed
+
+    if embedder == "gemini":
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+
+        def embed(texts: List[str]) -> np.ndarray:
+            result = genai.embed_content(
+                model=GEMINI_EMBEDDING_MODEL,
+                content=texts,
+                task_type="retrieval_document"
+            )
+            return np.array(result["embedding"], dtype=np.float32)
+    else:
+        from local_embedder import LocalEmbedder
+        local = LocalEmbedder.load(store_path)
+        if local is None:
+            raise RuntimeError(f"No fitted local embedder in {store_path}; start the API once or use --embedder gemini")
+
+        def embed(texts: List[str]) -> np.ndarray:
+            return local.encode_batch(texts)
+
+    _worker_embed = embed
+
+
+def _embed_batch(texts: List[str]) -> np.ndarray:
+    """Embed one batch in a worker, retrying transient API errors with backoff"""
+    for attempt in range(EMBED_RETRIES):
+        try:
+            return _worker_embed(texts)
+        except Exception:
+            if attempt == EMBED_RETRIES - 1:
+                raise
+            time.sleep(2 ** attempt)
+
+
+class _Ingest:
+    """Writes embedded batches to the store in submission order and keeps the source manifest"""
+
+    def __init__(self, store_path: str, commit_every: int):
+        self.store_path = store_path
+        self.commit_every = commit_every
+        self.writer: Optional[StoreWriter] = StoreWriter(store_path) if is_store(store_path) else None
+        self.sources = dict(self.writer.meta.get("sources", {})) if self.writer is not None else {}
+        self.pending_deletes: List[Tuple[int, int]] = []
+        self.uncommitted = 0
+        self.written = 0
+
+    @property
+    def count(self) -> int:
+        return self.writer.meta["count"] if self.writer is not None else 0
+
+    def delete(self, key: str) -> None:
+        """Mark the rows of a previously ingested document as deleted"""
+        entry = self.sources.pop(key, None)
+        if entry is not None:
+            self.pending_deletes.append(tuple(entry["rows"]))
+
+    def write(self, segments: List[Tuple[str, str, str, int, bool]], texts: List[str], vectors: np.ndarray) -> None:
+        """
+        Append one embedded batch. segments lists (key, country, sha256, chunk count,
+        last segment of the document) for the documents the batch covers, in order.
+        """
+        if self.writer is None:
+            self.writer = StoreWriter(self.store_path, dim=vectors.shape[1])
+
+        countries = [country for _, country, _, n, _ in segments for _ in range(n)]
+        start = self.writer.meta["count"]
+        self.writer.add_batch(countries, texts, vectors)
+
+        for key, country, sha256, n, last in segments:
+            entry = self.sources.setdefault(key, {"sha256": sha256, "country": country, "rows": [start, start]})
+            entry["rows"][1] = start + n
+            # Incomplete entries are re-ingested (and their rows deleted) on the next run
+            entry["complete"] = last
+            start += n
+
+        self.uncommitted += len(vectors)
+        self.written += len(vectors)
+        if self.uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self) -> None:
+        if self.writer is None:
+            return
+        for start, end in self.pending_deletes:
+            self.writer.delete_rows(start, end)
+        self.pending_deletes = []
+        self.writer.meta["sources"] = self.sources
+        self.writer.commit()
+        self.uncommitted = 0
+
+    def close(self) -> None:
+        if self.writer is None:
+            return
+        if self.uncommitted or self.pending_deletes:
+            self.commit()
+        # Closing without a commit leaves the store generation (and the indexes built on it) untouched
+        self.writer.abort()
+
+    def abort(self) -> None:
+        if self.writer is not None:
+            self.writer.abort()
+
+
+def ingest(
+        source_dir: str,
+        store_path: str,
+        country: Optional[str] = None,
+        embedder: str = "gemini",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        overlap: int = DEFAULT_OVERLAP,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        workers: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        commit_every: int = DEFAULT_COMMIT_EVERY,
+        prune: bool = False,
+        api_key: str = ""
+) -> dict:
+    """Ingest new and changed documents. Returns counts of documents and chunks processed."""
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap must be at least 0 and smaller than chunk_size")
+    if embedder == "local" and not is_store(store_path):
+        raise ValueError("The local embedder needs an existing store to load its projection from")
+    if embedder == "gemini" and not api_key:
+        from config import get_settings
+        api_key = get_settings().gemini_api_key
+
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    state = _Ingest(store_path, commit_every)
+    stats = {"documents": 0, "skipped": 0, "deleted": 0, "chunks": 0}
+
+    in_flight: Deque = deque()
+    texts: List[str] = []
+    segments: List[list] = []
+
+    def drain(limit: int) -> None:
+        # Results are written in submission order, so a document's rows stay contiguous
+        while len(in_flight) > limit:
+            future, batch_texts, batch_segments = in_flight.popleft()
+            state.write([tuple(s) for s in batch_segments], batch_texts, future.result())
+
+    def submit(pool: ProcessPoolExecutor) -> None:
+        nonlocal texts, segments
+        if texts:
+            drain(max_in_flight - 1)
+            in_flight.append((pool.submit(_embed_batch, texts), texts, segments))
+            texts, segments = [], []
+
+    seen = set()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(embedder, store_path, api_key)) as pool:
+        try:
+            for key, doc_country, path in iter_documents(source_dir, country):
+                seen.add(key)
+                sha256 = file_sha256(path)
+                entry = state.sources.get(key)
+                if entry is not None and entry["sha256"] == sha256 and entry.get("complete", True):
+                    stats["skipped"] += 1
+                    continue
+
+                # An interrupted document that is still the last thing in the store
+                # continues after its committed chunks; anything else starts over
+                resume = 0
+                if entry is not None and entry["sha256"] == sha256 and entry["rows"][1] == state.count:
+                    resume = entry["rows"][1] - entry["rows"][0]
+                else:
+                    state.delete(key)
+                stats["documents"] += 1
+                for chunk in itertools.islice(iter_chunks(path, chunk_size, overlap), resume, None):
+                    # Full batches go out only once the next chunk exists, so the
+                    # document's final segment is still here to be marked complete
+                    if len(texts) == batch_size:
+                        submit(pool)
+                    if segments and segments[-1][0] == key:
+                        segments[-1][3] += 1
+                    else:
+                        segments.append([key, doc_country, sha256, 1, False])
+                    texts.append(chunk)
+                    stats["chunks"] += 1
+                if segments and segments[-1][0] == key:
+                    segments[-1][4] = True
+
+            submit(pool)
+            drain(0)
+
+            if prune:
+                for key in [k for k in state.sources if k not in seen]:
+                    state.delete(key)
+                    stats["deleted"] += 1
+        except BaseException:
+            for future, _, _ in in_flight:
+                future.cancel()
+            state.abort()
+            raise
+
+    state.close()
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Chunk, embed and append source documents to an embedding store")
+    parser.add_argument("source_dir", help="Directory of .txt/.md documents, one subdirectory per country")
+    parser.add_argument("store_path")
+    parser.add_argument("--country", default=None, help="Assign every document in source_dir to this country")
+    parser.add_argument("--embedder", choices=("gemini", "local"), default="gemini",
+                        help="gemini (embedding-001) or the store's fitted local embedder")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Words per chunk")
+    parser.add_argument("--overlap", type=int, default=DEFAULT_OVERLAP, help="Words shared by consecutive chunks")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Chunks per embedding call")
+    parser.add_argument("--workers", type=int, default=None, help="Embedding processes (default: CPU count)")
+    parser.add_argument("--commit-every", type=int, default=DEFAULT_COMMIT_EVERY,
+                        help="Chunks written between commits (the resume granularity)")
+    parser.add_argument("--prune", action="store_true", help="Delete rows of documents no longer in source_dir")
+
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    stats = ingest(
+        args.source_dir,
+        args.store_path,
+        country=args.country,
+        embedder=args.embedder,
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        commit_every=args.commit_every,
+        prune=args.prune
+    )
+    print(
+        f"Ingested {stats['chunks']} chunks from {stats['documents']} documents "
+        f"({stats['skipped']} unchanged, {stats['deleted']} removed) in {time.perf_counter() - start:.1f}s"
+    )
+    print("Running APIs pick the changes up via POST /api/admin/reload or VECTOR_STORE_WATCH_SECONDS")
+
+
+if __name__ == "__main__":
+    main()
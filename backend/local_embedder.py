@@ -0,0 +1,182 @@
+"""
+Offline query embedder.
+
+Text is turned into hashed word unigram/bigram and character trigram
+features, and a ridge-regression projection fitted on the corpus maps those
+features into the same space as the document embeddings. No network or model
+download is needed, and encoding a query takes about a tenth of a millisecond
+since it only touches the projection rows of the query's own features.
+
+The fitted projection is saved inside the binary store:
+
+    query_embedder.json  feature count, dimension, store generation
+    query_embedder.f32   float32 projection, n_features x dim
+"""
+import json
+import os
+import re
+import zlib
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from embedding_store import write_array
+
+EMBEDDER_META_FILE = "query_embedder.json"
+EMBEDDER_WEIGHTS_FILE = "query_embedder.f32"
+
+N_FEATURES = 4096
+RIDGE_ALPHA = 1.0
+
+# Fitting cost is bounded by sampling documents and truncating their text
+FIT_SAMPLE_SIZE = 20000
+FIT_MAX_CHARS = 4000
+FIT_BLOCK_ROWS = 2048
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+
+
+def _features(text: str, n_features: int) -> Dict[int, float]:
+    """Signed hashed feature counts for word unigrams, bigrams and character trigrams"""
+    counts: Dict[int, float] = {}
+    tokens = TOKEN_PATTERN.findall(text.lower())
+
+    grams = list(tokens)
+    grams.extend(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    for token in tokens:
+        padded = f"#{token}#"
+        grams.extend("~" + padded[i:i + 3] for i in range(len(padded) - 2))
+
+    for gram in grams:
+        h = zlib.crc32(gram.encode("utf-8"))
+        index = h % n_features
+        counts[index] = counts.get(index, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+    return counts
+
+
+def featurize(texts: Sequence[str], n_features: int = N_FEATURES) -> np.ndarray:
+    """Dense (len(texts), n_features) matrix of log-scaled, L2-normalized hashed features"""
+    matrix = np.zeros((len(texts), n_features), dtype=np.float32)
+    for i, text in enumerate(texts):
+        counts = _features(text, n_features)
+        if counts:
+            indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            matrix[i, indices] = np.sign(values) * np.log1p(np.abs(values))
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def sparse_features(text: str, n_features: int = N_FEATURES):
+    """(feature indices, weights) of one text: the nonzero entries of its featurize() row"""
+    counts = _features(text, n_features)
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    values = np.sign(values) * np.log1p(np.abs(values))
+    if len(values):
+        values /= np.linalg.norm(values)
+    return indices, values
+
+
+class LocalEmbedder:
+    def __init__(self, projection: np.ndarray, generation: int = 0):
+        self.projection = projection
+        self.n_features = projection.shape[0]
+        self.dim = projection.shape[1]
+        self.generation = generation
+
+    @classmethod
+    def fit(
+            cls,
+            texts: Sequence[str],
+            embeddings: np.ndarray,
+            n_features: int = N_FEATURES,
+            alpha: float = RIDGE_ALPHA,
+            generation: int = 0,
+            seed: int = 0
+    ) -> "LocalEmbedder":
+        """
+        Fit the feature -> embedding projection by ridge regression on (text, embedding) pairs.
+        Uses the dual form when there are fewer documents than features.
+        """
+        count = len(texts)
+        rows = np.arange(count)
+        if count > FIT_SAMPLE_SIZE:
+            rows = np.sort(np.random.default_rng(seed).choice(count, size=FIT_SAMPLE_SIZE, replace=False))
+
+        print(f"Fitting local query embedder on {len(rows)} document chunks...")
+        targets = np.asarray(embeddings[rows], dtype=np.float32)
+        norms = np.linalg.norm(targets, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        targets = targets / norms
+
+        if len(rows) <= n_features:
+            features = featurize([texts[i][:FIT_MAX_CHARS] for i in rows], n_features)
+            gram = features @ features.T
+            gram[np.diag_indices_from(gram)] += alpha
+            projection = features.T @ np.linalg.solve(gram, targets)
+        else:
+            xtx = np.zeros((n_features, n_features), dtype=np.float64)
+            xty = np.zeros((n_features, targets.shape[1]), dtype=np.float64)
+            for start in range(0, len(rows), FIT_BLOCK_ROWS):
+                block = rows[start:start + FIT_BLOCK_ROWS]
+                features = featurize([texts[i][:FIT_MAX_CHARS] for i in block], n_features)
+                xtx += features.T @ features
+                xty += features.T @ targets[start:start + len(block)]
+            xtx[np.diag_indices_from(xtx)] += alpha
+            projection = np.linalg.solve(xtx, xty)
+
+        return cls(projection.astype(np.float32), generation)
+
+    def encode(self, text: str) -> np.ndarray:
+        """Embed one query: a weighted sum of the projection rows of its features"""
+        return self.encode_sparse(*sparse_features(text, self.n_features))
+
+    def encode_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed many queries into one (n_texts, dim) array.
+        A query touches ~60 of the 4096 features, so a gather + GEMV per row is
+        faster than a dense block GEMM or a padded batched matmul here.
+        """
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            indices, values = sparse_features(text, self.n_features)
+            if len(indices):
+                embeddings[i] = values @ self.projection[indices]
+        return embeddings
+
+    def encode_sparse(self, indices: np.ndarray, values: np.ndarray) -> np.ndarray:
+        """Embed a text already featurized with sparse_features()"""
+        if not len(indices):
+            return np.zeros(self.dim, dtype=np.float32)
+        return values @ self.projection[indices]
+
+    def save(self, path: str) -> None:
+        """Write the projection into a store directory"""
+        write_array(os.path.join(path, EMBEDDER_WEIGHTS_FILE), self.projection.astype(np.float32))
+        meta = {"n_features": self.n_features, "dim": self.dim, "generation": self.generation}
+        tmp_path = os.path.join(path, EMBEDDER_META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, os.path.join(path, EMBEDDER_META_FILE))
+
+    @classmethod
+    def load(cls, path: str, generation: Optional[int] = None) -> Optional["LocalEmbedder"]:
+        """
+        Open a saved projection, or return None if it is missing or was fitted on
+        other data (pass generation=None to accept any fitted projection)
+        """
+        meta_path = os.path.join(path, EMBEDDER_META_FILE)
+        if not os.path.isfile(meta_path):
+            return None
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if generation is not None and meta["generation"] != generation:
+            return None
+
+        projection = np.memmap(os.path.join(path, EMBEDDER_WEIGHTS_FILE), dtype=np.float32, mode="r",
+                               shape=(meta["n_features"], meta["dim"]))
+        return cls(projection, meta["generation"])
@@ -1,24 +1,40 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+import time
+
+# Boot clock for the startup measurements below (see warmup.py)
+_boot_started = time.perf_counter()
+
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import timedelta
-from typing import List
+from typing import List, Optional
+import asyncio
+import hmac
+import json
 import logging
 import traceback
 
 import models
 import schemas
-from database import engine, get_db
+from database import engine, get_db, SessionLocal
 from auth import (
     get_password_hash,
     authenticate_user,
     create_access_token,
     get_current_user
 )
-from ai_service_unified import get_unified_ai_service
 from config import get_settings
+from warmup import StartupTimer, warm_up
+from scheduler import Overloaded
+
+# The index, NumPy and the LLM clients (ai_service_unified, vector_search, http_client)
+# are imported on first use or by the warmup task, not at import time
+
+startup_timer = StartupTimer(_boot_started)
+startup_timer.mark_imported()
 
 # Configure logging
 logging.basicConfig(
@@ -71,7 +87,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
             "message": exc.detail,
             "status_code": exc.status_code,
             "path": str(request.url.path)
-        }
+        },
+        headers=getattr(exc, "headers", None)
     )
 
 
@@ -106,6 +123,66 @@ async def general_exception_handler(request: Request, exc: Exception):
     )
 
 
+@app.middleware("http")
+async def measure_first_request(request: Request, call_next):
+    """Record when the first real (non-probe) request was served and how long it took"""
+    if startup_timer.first_request_seconds is not None or request.url.path in ("/health", "/ready"):
+        return await call_next(request)
+    started = time.perf_counter()
+    response = await call_next(request)
+    startup_timer.mark_first_request(time.perf_counter() - started)
+    logger.info(f"First request served {startup_timer.first_request_seconds:.2f}s after boot")
+    return response
+
+
+@app.on_event("startup")
+async def start_warmup():
+    """Load the index and warm the providers in the background; /ready reports when done"""
+    if not settings.warmup_enabled:
+        startup_timer.mark_ready()
+        return
+
+    async def run():
+        await warm_up(startup_timer)
+        if startup_timer.ready:
+            logger.info(f"Worker ready {startup_timer.ready_seconds:.2f}s after boot "
+                        f"(imports {startup_timer.import_seconds:.2f}s)")
+
+    # Keep a reference so the task is not garbage collected while running
+    app.state.warmup_task = asyncio.create_task(run())
+
+
+@app.on_event("startup")
+def start_background_tasks():
+    """Attach to the shared index and start the embedding store watcher if configured"""
+    if settings.vector_index_shared:
+        # Workers attach at boot (the first one builds), instead of on their first request
+        from vector_search import get_vector_search
+        get_vector_search()
+        logger.info("Attached to the shared vector index")
+    if settings.vector_store_watch_seconds > 0:
+        from vector_search import start_store_watcher
+        start_store_watcher(settings.vector_store_watch_seconds)
+        logger.info(f"Watching embedding store every {settings.vector_store_watch_seconds}s")
+
+
+@app.on_event("shutdown")
+def save_caches():
+    """Persist the query embedding cache if a path is configured"""
+    try:
+        from vector_search import get_embedding_cache
+        get_embedding_cache().save()
+    except Exception as e:
+        logger.error(f"Failed to save embedding cache: {e}")
+
+
+@app.on_event("shutdown")
+async def close_connections():
+    """Close the pooled LLM provider connections"""
+    from http_client import close_http_client
+    await close_http_client()
+
+
 @app.get("/")
 def read_root():
     """API root endpoint"""
@@ -117,8 +194,11 @@ def read_root():
             "endpoints": {
                 "auth": "/api/auth",
                 "chat": "/api/chat",
+                "chat_stream": "/api/chat/stream",
                 "docs": "/docs",
-                "health": "/health"
+                "health": "/health",
+                "ready": "/ready",
+                "metrics": "/api/metrics"
             }
         }
     except Exception as e:
@@ -151,6 +231,16 @@ def health_check():
         )
 
 
+@app.get("/ready")
+def readiness_check():
+    """Readiness probe: 200 once the index is loaded and the providers are warm, 503 while warming up"""
+    body = {"status": "ready" if startup_timer.ready else "warming_up", **startup_timer.stats()}
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if startup_timer.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=body
+    )
+
+
 @app.post("/api/auth/signup", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
 def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
     """Register a new user with comprehensive validation"""
@@ -271,6 +361,46 @@ async def get_me(current_user: models.User = Depends(get_current_user)):
         )
 
 
+def validate_chat_request(chat_request: schemas.ChatRequest):
+    """Reject empty or overlong questions and unknown countries"""
+    if not chat_request.question or not chat_request.question.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Question cannot be empty"
+        )
+
+    if len(chat_request.question) > 1000:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Question is too long. Please limit to 1000 characters."
+        )
+
+    # Validate country if provided
+    valid_countries = ["USA", "UK", "Canada", "Australia"]
+    if chat_request.country and chat_request.country not in valid_countries:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid country. Must be one of: {', '.join(valid_countries)}"
+        )
+
+    if chat_request.session_id is not None and not 0 < len(chat_request.session_id) <= 100:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Session id must be 1 to 100 characters long"
+        )
+
+
+def session_key(user: models.User, session_id: Optional[str]) -> Optional[str]:
+    """Sessions are per user, so one user cannot continue another's conversation"""
+    return f"{user.id}:{session_id}" if session_id is not None else None
+
+
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
 @app.post("/api/chat", response_model=schemas.ChatResponse)
 async def chat(
         chat_request: schemas.ChatRequest,
@@ -279,38 +409,29 @@ async def chat(
 ):
     """Send a question and get an AI-powered answer with error handling"""
     try:
-        # Validate input
-        if not chat_request.question or not chat_request.question.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Question cannot be empty"
-            )
-
-        if len(chat_request.question) > 1000:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Question is too long. Please limit to 1000 characters."
-            )
-
-        # Validate country if provided
-        valid_countries = ["USA", "UK", "Canada", "Australia"]
-        if chat_request.country and chat_request.country not in valid_countries:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid country. Must be one of: {', '.join(valid_countries)}"
-            )
+        validate_chat_request(chat_request)
 
         # Generate answer
+        cached = False
         try:
+            from ai_service_unified import get_unified_ai_service
             ai_service = get_unified_ai_service()
-            answer = ai_service.generate_answer(
+            answer, cached = await ai_service.generate_answer(
                 question=chat_request.question.strip(),
-                country=chat_request.country
+                country=chat_request.country,
+                session_id=session_key(current_user, chat_request.session_id)
             )
 
             if not answer:
                 answer = "I'm sorry, I couldn't generate an answer. Please try rephrasing your question."
 
+        except Overloaded as e:
+            logger.warning(f"AI service overloaded: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="The assistant is busy right now. Please try again shortly.",
+                headers={"Retry-After": str(e.retry_after)}
+            )
         except Exception as e:
             logger.error(f"AI service error: {e}")
             answer = "I'm experiencing technical difficulties. Please try again in a moment."
@@ -333,7 +454,9 @@ async def chat(
 
         return {
             "answer": answer,
-            "country": chat_request.country
+            "country": chat_request.country,
+            "cached": cached,
+            "session_id": chat_request.session_id
         }
 
     except HTTPException:
@@ -346,6 +469,102 @@ async def chat(
         )
 
 
+@app.post("/api/chat/stream")
+async def chat_stream(
+        chat_request: schemas.ChatRequest,
+        current_user: models.User = Depends(get_current_user)
+):
+    """
+    Stream the answer as Server-Sent Events while it is generated:
+    "data: {"token": ...}" per piece of text, then "event: done" with the full answer
+    (saved to chat history), or "event: error" if generation fails midway or every
+    provider is too busy to take it. Unless saturated providers fall back to the
+    extractive answer, answers 503 with Retry-After up front when they are saturated.
+    """
+    validate_chat_request(chat_request)
+    question = chat_request.question.strip()
+    country = chat_request.country
+    session_id = session_key(current_user, chat_request.session_id)
+
+    from ai_service_unified import get_unified_ai_service
+    ai_service = get_unified_ai_service()
+    if ai_service.router.saturated() and not ai_service.settings.extractive_on_overload:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The assistant is busy right now. Please try again shortly.",
+            headers={"Retry-After": str(ai_service.router.retry_after())}
+        )
+    user_id, user_email = current_user.id, current_user.email
+
+    def save_answer(answer: str) -> Optional[int]:
+        # The request's session is closed by the time the stream ends, so save with a fresh one
+        db = SessionLocal()
+        try:
+            chat_history = models.ChatHistory(
+                user_id=user_id,
+                question=question,
+                answer=answer,
+                country=country
+            )
+            db.add(chat_history)
+            db.commit()
+            logger.info(f"Streamed chat saved for user {user_email}")
+            return chat_history.id
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to save chat history: {e}")
+            return None
+        finally:
+            db.close()
+
+    async def events():
+        parts = []
+        cached_answer = None
+        try:
+            # The cache lookup and the answer use the same index snapshot
+            vector_search = await ai_service.snapshot()
+            if session_id is None:
+                # A turn of a conversation depends on the turns before it: never answered from the cache
+                cached_answer = await ai_service.cached_answer(question=question, country=country,
+                                                               vector_search=vector_search)
+            if cached_answer is not None:
+                parts.append(cached_answer)
+                yield sse_event({"token": cached_answer})
+            else:
+                async for token in ai_service.stream_answer(question=question, country=country,
+                                                            session_id=session_id, vector_search=vector_search):
+                    parts.append(token)
+                    yield sse_event({"token": token})
+        except Overloaded as e:
+            logger.warning(f"AI service overloaded while streaming: {e}")
+            yield sse_event({
+                "message": "The assistant is busy right now. Please try again shortly.",
+                "retry_after": e.retry_after
+            }, event="error")
+            return
+        except Exception as e:
+            logger.error(f"AI service error while streaming: {e}")
+            if not parts:
+                parts.append("I'm experiencing technical difficulties. Please try again in a moment.")
+                yield sse_event({"token": parts[0]})
+            else:
+                yield sse_event({"message": "The answer was interrupted. Please try again."}, event="error")
+                return
+
+        answer = "".join(parts) or "I'm sorry, I couldn't generate an answer. Please try rephrasing your question."
+
+        chat_id = await run_in_threadpool(save_answer, answer)
+        done = {"answer": answer, "country": country, "id": chat_id, "cached": cached_answer is not None,
+                "session_id": chat_request.session_id}
+        yield sse_event(done, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/api/chat/history", response_model=List[schemas.ChatHistoryItem])
 async def get_chat_history(
         current_user: models.User = Depends(get_current_user),
@@ -397,8 +616,8 @@ async def get_chat_history(
 
 
 @app.get("/api/countries")
-async def get_countries():
-    """Get list of available countries with error handling"""
+def get_countries():
+    """Get list of available countries with error handling (sync: the first call may wait for the index to load)"""
     try:
         from vector_search import get_vector_search
         vs = get_vector_search()
@@ -416,6 +635,82 @@ async def get_countries():
         return {"countries": ["USA", "UK", "Canada", "Australia"]}
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Cache, request coalescing and provider health counters used to size caches and watch latency"""
+    from vector_search import get_embedding_cache, get_result_cache
+    from semantic_cache import get_semantic_cache
+    from sessions import get_session_store
+    from ai_service_unified import get_unified_ai_service
+    return {
+        "embedding_cache": get_embedding_cache().stats(),
+        "result_cache": get_result_cache().stats(),
+        "semantic_cache": get_semantic_cache().stats(),
+        "single_flight": get_unified_ai_service().single_flight.stats(),
+        "providers": get_unified_ai_service().router.stats(),
+        "sessions": get_session_store().stats(),
+        "startup": startup_timer.stats()
+    }
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Guard for index maintenance endpoints"""
+    if not settings.admin_token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin endpoints are disabled. Set ADMIN_TOKEN to enable them."
+        )
+    # Constant-time comparison, so response timing does not reveal how much of the token matched
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), settings.admin_token.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin token"
+        )
+
+
+@app.post("/api/admin/reload", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_admin)])
+def reload_index():
+    """Rebuild the vector index from disk in the background and swap it in when ready"""
+    from vector_search import reload_vector_search
+    started = reload_vector_search()
+    logger.info("Vector index reload started" if started else "Vector index reload already running")
+    return {"status": "reloading" if started else "already_reloading"}
+
+
+@app.post("/api/admin/documents", dependencies=[Depends(require_admin)])
+def append_documents(request: schemas.AppendDocumentsRequest):
+    """Append pre-embedded chunks to the index without a full rebuild"""
+    if not request.chunks:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No chunks provided"
+        )
+
+    from vector_search import append_to_vector_search, get_vector_search
+    if get_vector_search().store is None:
+        # Rows appended to an index loaded from the CSV would be lost on the next reload or restart
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The index is loaded from the CSV file, which cannot be appended to. "
+                   "Convert it to a binary store first (python embedding_store.py convert)."
+        )
+    try:
+        vs = append_to_vector_search(
+            [chunk.country for chunk in request.chunks],
+            [chunk.text_chunk for chunk in request.chunks],
+            [chunk.embedding for chunk in request.chunks]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    logger.info(f"Appended {len(request.chunks)} chunks to the vector index")
+    return {
+        "appended": len(request.chunks),
+        "total_chunks": len(vs.texts),
+        "version": vs.version
+    }
+
+
 @app.delete("/api/chat/history/{chat_id}")
 async def delete_chat_history(
         chat_id: int,
@@ -0,0 +1,60 @@
+"""
+Maximal Marginal Relevance (MMR) re-ranking of retrieved chunks.
+
+Greedily picks the candidate maximizing
+
+    lambda_mult * relevance - (1 - lambda_mult) * max cosine similarity to the chunks already picked
+
+so passages that repeat an earlier pick are pushed down or, above
+max_similarity, dropped. The candidate-candidate similarities come from one
+matrix product and each step is a vectorized update over all candidates.
+"""
+import numpy as np
+
+
+def mmr(
+        relevance: np.ndarray,
+        vectors: np.ndarray,
+        k: int,
+        lambda_mult: float = 0.7,
+        max_similarity: float = 1.0
+) -> np.ndarray:
+    """
+    relevance: (n,) candidate relevance, higher is better (ideally in [0, 1])
+    vectors: (n, dim) L2-normalized candidate vectors
+    lambda_mult: 1.0 = relevance only, 0.0 = diversity only
+    max_similarity: candidates at least this similar to a picked chunk are dropped
+    Returns: indices of the picked candidates, in pick order (at most k)
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    n = len(relevance)
+    if n == 0 or k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    similarity = vectors @ vectors.T
+    selected = [int(np.argmax(relevance))]
+    max_sim = similarity[selected[0]].copy()
+    available = max_sim < max_similarity
+    available[selected[0]] = False
+
+    while len(selected) < k and available.any():
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_sim
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        np.maximum(max_sim, similarity[best], out=max_sim)
+        available &= max_sim < max_similarity
+        available[best] = False
+
+    return np.array(selected, dtype=np.int64)
+
+
+def scale_scores(scores: np.ndarray) -> np.ndarray:
+    """Min-max scale retrieval scores (cosine, BM25 or RRF) to [0, 1] so they are comparable to similarities"""
+    scores = np.asarray(scores, dtype=np.float32)
+    if not len(scores):
+        return scores
+    low, high = float(scores.min()), float(scores.max())
+    if high - low <= 0:
+        return np.ones_like(scores)
+    return (scores - low) / (high - low)
@@ -0,0 +1,634 @@
+"""
+LLM providers behind one interface, and the router that picks between them.
+
+Each LLM provider (Ollama, Gemini) builds its own prompt within its own context
+token budget and has its own latency budget (timeout). ProviderRouter tries
+them in the configured order (settings.provider_order) and keeps a circuit
+breaker per provider: after circuit_failure_threshold consecutive failures
+or timeouts a provider is skipped for circuit_reset_seconds, then a single
+trial request decides whether it is healthy again. Worst-case latency is
+therefore bounded by the sum of the timeouts of the providers tried, and an
+unhealthy provider costs nothing while its circuit is open.
+
+With hedging enabled, a second request goes to the next provider in order
+when the first has not answered after its p95 latency (hedge_delay_seconds
+until enough latencies are recorded); whichever succeeds first wins and the
+other request is cancelled.
+
+Requests to a provider go through its RequestScheduler (scheduler.py): at
+most max_concurrency run at once and a bounded queue waits behind them.
+A provider that is saturated is skipped like a failed one, but without
+counting against its circuit; when every provider is saturated the router
+raises scheduler.Overloaded so the API can answer 503 with Retry-After.
+
+Generation takes an optional ConversationSession (sessions.py). Ollama uses
+it to continue a conversation from the context tokens it returned for the
+previous turn, sending only the new question and chunks it has not seen.
+
+"extractive" (extractive.py, formerly "simple") answers from the retrieved
+sentences without an LLM in a few milliseconds; on its own it is the no-LLM
+mode, and last in the order it is the fallback that always answers.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from contextlib import AsyncExitStack
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from context_builder import build_context
+from extractive import ExtractiveAnswerer
+from http_client import get_http_client
+from scheduler import Overloaded, RequestScheduler
+from sessions import ConversationSession, chunk_key
+
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:{method}"
+GEMINI_MODEL = "gemini-2.0-flash-exp"
+
+# Latencies kept per provider for percentiles, and the samples needed before p95 drives hedging
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+
+
+def build_prompt(question: str, context: str, country: Optional[str]) -> str:
+    country_filter = f" about {country}" if country else ""
+
+    return f"""You are a helpful study abroad assistant for USA, UK, Canada, and Australia.
+
+Question: {question}{country_filter}
+
+Context from study abroad guides:
+{context}
+
+Instructions:
+1. Answer the question based on the context provided
+2. If the context contains information from multiple countries, use only the relevant country's information
+3. If the context doesn't have the specific information requested, say: "I don't have specific information about [topic] in the documents."
+4. Provide clear, helpful, and well-formatted answers
+5. Use bullet points or numbered lists when appropriate"""
+
+
+def build_followup_prompt(question: str, context: str, country: Optional[str]) -> str:
+    """Prompt for a turn that continues an Ollama conversation: the instructions and earlier context are already there"""
+    country_filter = f" about {country}" if country else ""
+    extra = f"\n\nMore context from study abroad guides:\n{context}" if context else ""
+
+    return f"""Follow-up question: {question}{country_filter}{extra}
+
+Answer the follow-up question using the conversation so far and any new context, following the same instructions."""
+
+
+class ProviderError(Exception):
+    """Raised when no provider produced an answer"""
+
+
+class Provider:
+    """
+    An answer generator. Subclasses implement generate() and stream();
+    search_results are (country, text_chunk, score) tuples with one
+    estimated token count per chunk in token_counts, and session, if given,
+    is the conversation the question belongs to.
+    """
+    name = ""
+
+    def __init__(self, timeout_seconds: float, context_tokens: int, max_concurrency: int = 4):
+        self.timeout_seconds = timeout_seconds
+        self.context_tokens = context_tokens
+        self.max_concurrency = max_concurrency
+
+    def context(self, search_results, token_counts: Optional[Sequence[int]]) -> str:
+        """Best chunks that fit this provider's token budget (see context_builder.py)"""
+        context, _ = build_context(search_results, self.context_tokens, token_counts)
+        return context
+
+    async def generate(self, question: str, country: Optional[str], search_results,
+                       token_counts: Optional[Sequence[int]] = None,
+                       session: Optional[ConversationSession] = None, vector_search=None) -> str:
+        """vector_search: the index snapshot search_results came from"""
+        raise NotImplementedError
+
+    def stream(self, question: str, country: Optional[str], search_results,
+               token_counts: Optional[Sequence[int]] = None,
+               session: Optional[ConversationSession] = None, vector_search=None) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def warm_up(self) -> None:
+        """Prepare for the first request (load a model, open a connection); optional"""
+
+
+class OllamaProvider(Provider):
+    name = "ollama"
+
+    def __init__(self, url: str, model: str, timeout_seconds: float, context_tokens: int, keep_alive: str = "",
+                 max_concurrency: int = 2):
+        super().__init__(timeout_seconds, context_tokens, max_concurrency)
+        self.url = url
+        self.model = model
+        self.keep_alive = keep_alive
+
+    def _payload(self, question: str, country: Optional[str], search_results, token_counts, stream: bool,
+                 session: Optional[ConversationSession] = None) -> Tuple[dict, set]:
+        """
+        Request body, and the keys of every chunk the model will have seen once it has answered.
+        Within a session with a previous Ollama turn, only the chunks it has not seen are sent,
+        with the context tokens of that turn, so the earlier prompt is not processed again.
+        """
+        previous = session.context_for(self.name) if session is not None else None
+        if previous is None:
+            context = self.context(search_results, token_counts)
+            prompt = build_prompt(question, context, country)
+            seen = set()
+        else:
+            new = [i for i, (c, text, _) in enumerate(search_results) if chunk_key(c, text) not in previous.chunks]
+            context = self.context(
+                [search_results[i] for i in new],
+                [token_counts[i] for i in new] if token_counts is not None else None
+            )
+            prompt = build_followup_prompt(question, context, country)
+            seen = set(previous.chunks)
+        seen.update(chunk_key(c, text) for c, text, _ in search_results if text in context)
+
+        payload = {
+            "model": self.model,
+            "prompt": prompt + "\n\nAnswer:",
+            "stream": stream
+        }
+        if previous is not None:
+            payload["context"] = previous.tokens.tolist()
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+        return payload, seen
+
+    def _remember(self, session: Optional[ConversationSession], result: dict, seen: set) -> None:
+        """Keep the context Ollama returned for the session's next turn"""
+        if session is not None:
+            session.set_context(self.name, result.get("context"), seen)
+
+    async def warm_up(self) -> None:
+        """An empty prompt makes Ollama load the model (and keep it loaded for keep_alive)"""
+        payload = {"model": self.model, "prompt": "", "stream": False}
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+        response = await get_http_client().post(self.url, json=payload)
+        if response.status_code != 200:
+            raise Exception(f"Ollama API error: {response.status_code}")
+
+    async def generate(self, question, country, search_results, token_counts=None, session=None,
+                       vector_search=None) -> str:
+        """Generate answer using Ollama"""
+        payload, seen = self._payload(question, country, search_results, token_counts, False, session)
+        response = await get_http_client().post(self.url, json=payload)
+
+        if response.status_code == 200:
+            result = response.json()
+            self._remember(session, result, seen)
+            return result.get("response", "").strip()
+        else:
+            # Do not build on a context Ollama may have rejected
+            self._remember(session, {}, set())
+            raise Exception(f"Ollama API error: {response.status_code}")
+
+    async def stream(self, question, country, search_results, token_counts=None, session=None,
+                     vector_search=None) -> AsyncIterator[str]:
+        """Yield answer tokens from Ollama's streaming API (one JSON object per line)"""
+        payload, seen = self._payload(question, country, search_results, token_counts, True, session)
+
+        async with get_http_client().stream("POST", self.url, json=payload) as response:
+            if response.status_code != 200:
+                self._remember(session, {}, set())
+                raise Exception(f"Ollama API error: {response.status_code}")
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                part = json.loads(line)
+                if part.get("error"):
+                    raise Exception(f"Ollama API error: {part['error']}")
+                yield part.get("response", "")
+                if part.get("done"):
+                    # The last object carries the conversation context
+                    self._remember(session, part, seen)
+                    break
+
+
+class GeminiProvider(Provider):
+    name = "gemini"
+
+    def __init__(self, api_key: str, timeout_seconds: float, context_tokens: int, model: str = GEMINI_MODEL,
+                 max_concurrency: int = 16, api_url: str = GEMINI_API_URL):
+        super().__init__(timeout_seconds, context_tokens, max_concurrency)
+        self.api_key = api_key
+        self.model = model
+        self.api_url = api_url or GEMINI_API_URL
+
+    def _request(self, question: str, country: Optional[str], search_results, token_counts, method: str):
+        """URL, headers and body for a Gemini REST call (generateContent or streamGenerateContent)"""
+        url = self.api_url.format(model=self.model, method=method)
+        headers = {"x-goog-api-key": self.api_key}
+        prompt = build_prompt(question, self.context(search_results, token_counts), country)
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        return url, headers, body
+
+    async def warm_up(self) -> None:
+        """Fetch the model's metadata, leaving a TLS connection to the API in the pool"""
+        url = self.api_url.format(model=self.model, method="").rstrip(":")
+        response = await get_http_client().get(url, headers={"x-goog-api-key": self.api_key})
+        if response.status_code != 200:
+            raise Exception(f"Gemini API error: {response.status_code}")
+
+    @staticmethod
+    def _text(result: dict) -> str:
+        candidates = result.get("candidates") or [{}]
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
+
+    async def generate(self, question, country, search_results, token_counts=None, session=None,
+                       vector_search=None) -> str:
+        """Generate answer using Google Gemini"""
+        url, headers, body = self._request(question, country, search_results, token_counts, "generateContent")
+        response = await get_http_client().post(url, headers=headers, json=body)
+        if response.status_code != 200:
+            raise Exception(f"Gemini API error: {response.status_code}")
+        return self._text(response.json())
+
+    async def stream(self, question, country, search_results, token_counts=None, session=None,
+                     vector_search=None) -> AsyncIterator[str]:
+        """Yield answer text from Gemini's streaming mode (SSE) as chunks arrive"""
+        url, headers, body = self._request(question, country, search_results, token_counts, "streamGenerateContent")
+        async with get_http_client().stream("POST", url, params={"alt": "sse"}, headers=headers,
+                                            json=body) as response:
+            if response.status_code != 200:
+                raise Exception(f"Gemini API error: {response.status_code}")
+            async for line in response.aiter_lines():
+                if line.startswith("data: "):
+                    yield self._text(json.loads(line[6:]))
+
+
+class ExtractiveProvider(Provider):
+    """Cited extractive answer from the retrieved chunks (no LLM; CPU work runs in the default executor)"""
+    name = "extractive"
+
+    def __init__(self, answerer: ExtractiveAnswerer, timeout_seconds: float = 5.0, max_concurrency: int = 4):
+        super().__init__(timeout_seconds, 0, max_concurrency)
+        self.answerer = answerer
+
+    def _answer(self, question, country, search_results, vector_search) -> str:
+        embedder = vector_search.embedder if vector_search is not None else None
+        return self.answerer.answer(question, country, search_results, embedder)
+
+    async def generate(self, question, country, search_results, token_counts=None, session=None,
+                       vector_search=None) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._answer, question, country, search_results, vector_search)
+
+    async def stream(self, question, country, search_results, token_counts=None, session=None,
+                     vector_search=None) -> AsyncIterator[str]:
+        yield await self.generate(question, country, search_results, token_counts, session, vector_search)
+
+
+class CircuitBreaker:
+    """
+    closed: requests flow; failure_threshold consecutive failures open the circuit.
+    open: requests are refused until reset_seconds have passed.
+    half_open: one trial request is let through; success closes the circuit, failure reopens it.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_seconds: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = "half_open"
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.consecutive_failures = 0
+
+    def release(self) -> None:
+        """A trial request was cancelled before it finished: let the next request try instead"""
+        if self.state == "half_open":
+            self.state = "open"
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class _ProviderStats:
+    def __init__(self):
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    def percentile(self, q: float) -> Optional[float]:
+        return float(np.percentile(self.latencies, q)) if self.latencies else None
+
+
+class ProviderRouter:
+    """Fallback, circuit breaking and hedging across an ordered list of providers"""
+
+    def __init__(
+            self,
+            providers: List[Provider],
+            failure_threshold: int = 3,
+            reset_seconds: float = 30.0,
+            hedge_enabled: bool = False,
+            hedge_delay_seconds: float = 5.0,
+            queue_size: int = 32,
+            queue_timeout_seconds: float = 10.0
+    ):
+        self.providers = providers
+        self.breakers: Dict[str, CircuitBreaker] = {
+            p.name: CircuitBreaker(failure_threshold, reset_seconds) for p in providers
+        }
+        self.schedulers: Dict[str, RequestScheduler] = {
+            p.name: RequestScheduler(p.name, p.max_concurrency, queue_size, queue_timeout_seconds) for p in providers
+        }
+        self._stats: Dict[str, _ProviderStats] = {p.name: _ProviderStats() for p in providers}
+        self.hedge_enabled = hedge_enabled
+        self.hedge_delay_seconds = hedge_delay_seconds
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _available(self, exclude: Sequence[str] = ()) -> Optional[Provider]:
+        """Next provider in order whose circuit lets a request through"""
+        for provider in self.providers:
+            if provider.name not in exclude and self.breakers[provider.name].allow():
+                return provider
+        return None
+
+    def saturated(self) -> bool:
+        """
+        True if every provider's queue is full, so a request would be turned away.
+        Open circuits do not count: those requests take the normal fallback path.
+        """
+        return bool(self.providers) and all(self.schedulers[p.name].saturated() for p in self.providers)
+
+    def retry_after(self) -> int:
+        return min(self.schedulers[p.name].retry_after() for p in self.providers) if self.providers else 1
+
+    @staticmethod
+    def _no_answer(errors: List[str], overloaded: List[Overloaded]) -> Exception:
+        """Overloaded if some provider was only busy (worth retrying soon), else ProviderError"""
+        if overloaded:
+            return Overloaded("; ".join(errors + [str(e) for e in overloaded]),
+                              min(e.retry_after for e in overloaded))
+        return ProviderError("; ".join(errors) or "no provider available")
+
+    def _hedge_delay(self, provider: Provider) -> float:
+        stats = self._stats[provider.name]
+        if len(stats.latencies) >= HEDGE_MIN_SAMPLES:
+            return stats.percentile(95)
+        return self.hedge_delay_seconds
+
+    def _record(self, provider: Provider, started: float, error: Optional[BaseException]) -> None:
+        stats = self._stats[provider.name]
+        if error is None:
+            stats.successes += 1
+            stats.latencies.append(time.monotonic() - started)
+            self.breakers[provider.name].record_success()
+        else:
+            stats.failures += 1
+            if isinstance(error, asyncio.TimeoutError):
+                stats.timeouts += 1
+            self.breakers[provider.name].record_failure()
+
+    async def _call(self, provider: Provider, question, country, search_results, token_counts, session,
+                    vector_search) -> str:
+        try:
+            async with self.schedulers[provider.name].slot():
+                # The latency budget starts once the request holds a slot
+                started = time.monotonic()
+                try:
+                    answer = await asyncio.wait_for(
+                        provider.generate(question, country, search_results, token_counts, session, vector_search),
+                        provider.timeout_seconds
+                    )
+                except Exception as e:
+                    self._record(provider, started, e)
+                    raise
+        except (asyncio.CancelledError, Overloaded):
+            # Lost a hedged race, the client went away or the provider is busy:
+            # none of that says anything about the provider's health
+            self.breakers[provider.name].release()
+            raise
+        self._record(provider, started, None)
+        return answer
+
+    async def generate(self, question: str, country: Optional[str], search_results,
+                       token_counts: Optional[Sequence[int]] = None,
+                       session: Optional[ConversationSession] = None, vector_search=None) -> Tuple[str, str]:
+        """
+        Answer with the first healthy provider, falling back down the order on failure, timeout or a full queue.
+        Returns: (answer, provider name); raises Overloaded if providers were too busy to take
+        the request, ProviderError if every provider failed or is open
+        """
+        tried: List[str] = []
+        errors: List[str] = []
+        overloaded: List[Overloaded] = []
+        tasks: Dict[asyncio.Task, Provider] = {}
+        hedged = not self.hedge_enabled
+        try:
+            while True:
+                if not tasks:
+                    provider = self._available(tried)
+                    if provider is None:
+                        raise self._no_answer(errors, overloaded)
+                    tried.append(provider.name)
+                    tasks[asyncio.ensure_future(
+                        self._call(provider, question, country, search_results, token_counts, session, vector_search)
+                    )] = provider
+                    first = provider
+
+                delay = None if hedged or len(tasks) > 1 else self._hedge_delay(first)
+                done, _ = await asyncio.wait(tasks, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # The first request is slower than usual: race a second provider against it
+                    hedged = True
+                    hedge = self._available(tried)
+                    if hedge is not None:
+                        tried.append(hedge.name)
+                        self.hedges += 1
+                        tasks[asyncio.ensure_future(
+                            self._call(hedge, question, country, search_results, token_counts, session, vector_search)
+                        )] = hedge
+                    continue
+
+                for task in done:
+                    provider = tasks.pop(task)
+                    if task.exception() is None:
+                        if provider is not first:
+                            self.hedge_wins += 1
+                        if session is not None:
+                            session.answered_by(provider.name)
+                        return task.result(), provider.name
+                    error = task.exception()
+                    if isinstance(error, Overloaded):
+                        overloaded.append(error)
+                        continue
+                    errors.append(f"{provider.name}: {type(error).__name__} {error}".strip())
+                    print(f"Provider {provider.name} failed: {errors[-1]}")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def stream(self, question: str, country: Optional[str], search_results,
+                     token_counts: Optional[Sequence[int]] = None,
+                     session: Optional[ConversationSession] = None, vector_search=None) -> AsyncIterator[str]:
+        """
+        Stream from the first healthy provider. A provider that is saturated, fails or
+        sends nothing within its timeout is skipped for the next one; once text has been
+        sent, a failure is re-raised. The provider's slot is held until the stream ends.
+        Streams are not hedged.
+        """
+        errors: List[str] = []
+        overloaded: List[Overloaded] = []
+        tried: List[str] = []
+        slot = AsyncExitStack()
+        while True:
+            provider = self._available(tried)
+            if provider is None:
+                raise self._no_answer(errors, overloaded)
+            tried.append(provider.name)
+
+            try:
+                await slot.enter_async_context(self.schedulers[provider.name].slot())
+            except Overloaded as e:
+                self.breakers[provider.name].release()
+                overloaded.append(e)
+                continue
+
+            started = time.monotonic()
+            tokens = provider.stream(
+                question, country, search_results, token_counts, session, vector_search
+            ).__aiter__()
+            try:
+                first = await asyncio.wait_for(tokens.__anext__(), provider.timeout_seconds)
+            except StopAsyncIteration:
+                first = ""
+            except Exception as e:
+                self._record(provider, started, e)
+                errors.append(f"{provider.name}: {type(e).__name__} {e}".strip())
+                print(f"Provider {provider.name} failed: {errors[-1]}")
+                await tokens.aclose()
+                await slot.aclose()
+                continue
+            except BaseException:
+                await slot.aclose()
+                raise
+            break
+
+        finished = False
+        try:
+            if first:
+                yield first
+            async for token in tokens:
+                yield token
+            finished = True
+        except Exception as e:
+            self._record(provider, started, e)
+            raise
+        finally:
+            if finished:
+                self._record(provider, started, None)
+                if session is not None:
+                    session.answered_by(provider.name)
+            elif self.breakers[provider.name].state == "half_open":
+                self.breakers[provider.name].release()
+            await tokens.aclose()
+            await slot.aclose()
+
+    async def warm_up(self) -> Dict[str, str]:
+        """Warm every provider concurrently, each within its timeout. Returns: name -> "ok" or the error"""
+        async def warm(provider: Provider) -> str:
+            try:
+                await asyncio.wait_for(provider.warm_up(), provider.timeout_seconds)
+                return "ok"
+            except Exception as e:
+                print(f"Could not warm up provider {provider.name}: {type(e).__name__} {e}")
+                return f"{type(e).__name__} {e}".strip()
+
+        results = await asyncio.gather(*(warm(provider) for provider in self.providers))
+        return dict(zip((provider.name for provider in self.providers), results))
+
+    def stats(self) -> Dict[str, dict]:
+        providers = {}
+        for provider in self.providers:
+            stats, breaker = self._stats[provider.name], self.breakers[provider.name]
+            providers[provider.name] = {
+                "circuit": breaker.state,
+                "times_opened": breaker.times_opened,
+                "successes": stats.successes,
+                "failures": stats.failures,
+                "timeouts": stats.timeouts,
+                "timeout_seconds": provider.timeout_seconds,
+                "latency_p50_seconds": stats.percentile(50),
+                "latency_p95_seconds": stats.percentile(95),
+                "scheduler": self.schedulers[provider.name].stats(),
+            }
+        return {
+            "order": [p.name for p in self.providers],
+            "providers": providers,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+        }
+
+
+def create_provider(name: str, settings) -> Provider:
+    if name == "ollama":
+        return OllamaProvider(
+            url=settings.ollama_url,
+            model=settings.ollama_model,
+            timeout_seconds=settings.ollama_timeout_seconds,
+            context_tokens=settings.ollama_context_tokens,
+            keep_alive=settings.ollama_keep_alive,
+            max_concurrency=settings.ollama_max_concurrency
+        )
+    if name == "gemini":
+        return GeminiProvider(
+            api_key=settings.gemini_api_key,
+            timeout_seconds=settings.gemini_timeout_seconds,
+            context_tokens=settings.gemini_context_tokens,
+            max_concurrency=settings.gemini_max_concurrency,
+            api_url=settings.gemini_api_url
+        )
+    if name in ("extractive", "simple"):
+        return ExtractiveProvider(
+            ExtractiveAnswerer(settings.extractive_max_sentences, settings.extractive_max_chars),
+            max_concurrency=settings.retrieval_workers
+        )
+    raise ValueError(f"Unknown AI provider '{name}', expected 'ollama', 'gemini' or 'extractive'")
+
+
+def create_router(settings) -> ProviderRouter:
+    """
+    Router over settings.provider_order (comma-separated), or just settings.ai_provider
+    when no order is set; "extractive" (or its old name "simple") answers without an LLM
+    """
+    order = settings.provider_order or settings.ai_provider
+    names = [name.strip().lower() for name in order.split(",") if name.strip()]
+    providers = [create_provider(name, settings) for name in names]
+    return ProviderRouter(
+        providers,
+        failure_threshold=settings.circuit_failure_threshold,
+        reset_seconds=settings.circuit_reset_seconds,
+        hedge_enabled=settings.hedge_enabled,
+        hedge_delay_seconds=settings.hedge_delay_seconds,
+        queue_size=settings.llm_queue_size,
+        queue_timeout_seconds=settings.llm_queue_timeout_seconds
+    )
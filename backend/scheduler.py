@@ -0,0 +1,133 @@
+"""
+Bounded request scheduler with backpressure.
+
+Each LLM provider gets a RequestScheduler: at most max_concurrency requests
+run at once, up to max_queue more wait in FIFO order, and a request that has
+waited max_wait_seconds gives up. When the queue is full (or the wait runs
+out) Overloaded is raised straight away with a Retry-After estimate, so
+callers get a fast 503 instead of piling more work onto a saturated model
+and timing out together.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Sequence
+
+# Waits kept for percentiles
+WAIT_WINDOW = 500
+
+# Smoothing of the average slot hold time used for Retry-After
+HOLD_EMA_ALPHA = 0.2
+
+
+def _percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile (kept free of NumPy so main.py can import this module cheaply)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+
+class Overloaded(Exception):
+    """No capacity to take the request; retry_after is a suggested wait in seconds"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RequestScheduler:
+    """Concurrency limit plus a bounded FIFO wait queue with a per-request deadline (one event loop)"""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, max_wait_seconds: float):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.max_wait_seconds = max_wait_seconds
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._waits: Deque[float] = deque(maxlen=WAIT_WINDOW)
+        self._avg_hold_seconds: Optional[float] = None
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def saturated(self) -> bool:
+        """True if a new request would be rejected right now"""
+        return self.active >= self.max_concurrency and self.queued >= self.max_queue
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up for a new request"""
+        hold = self._avg_hold_seconds or self.max_wait_seconds or 1.0
+        return max(1, math.ceil(hold * (self.queued + 1) / self.max_concurrency))
+
+    async def _acquire(self) -> None:
+        if self.active < self.max_concurrency and not self.queued:
+            self.active += 1
+            self._waits.append(0.0)
+            return
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(f"{self.name} queue is full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise Overloaded(f"{self.name} queue wait exceeded {self.max_wait_seconds}s", self.retry_after())
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the caller went away: pass it on
+                self._release()
+            raise
+        finally:
+            if waiter in self._waiters and waiter.done():
+                self._waiters.remove(waiter)
+        self._waits.append(time.perf_counter() - started)
+
+    def _release(self) -> None:
+        """Hand the slot to the oldest live waiter, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one of the max_concurrency slots for the duration of the block"""
+        await self._acquire()
+        self.admitted += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            held = time.perf_counter() - started
+            self._avg_hold_seconds = held if self._avg_hold_seconds is None else (
+                HOLD_EMA_ALPHA * held + (1 - HOLD_EMA_ALPHA) * self._avg_hold_seconds
+            )
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_p50_seconds": _percentile(self._waits, 50),
+            "wait_p95_seconds": _percentile(self._waits, 95),
+            "avg_hold_seconds": self._avg_hold_seconds,
+        }
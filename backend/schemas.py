@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class UserCreate(BaseModel):
@@ -34,11 +34,14 @@ class TokenData(BaseModel):
 class ChatRequest(BaseModel):
     question: str
     country: Optional[str] = None
+    session_id: Optional[str] = None  # any client-chosen id; turns with the same id form a conversation
 
 
 class ChatResponse(BaseModel):
     answer: str
     country: Optional[str] = None
+    cached: bool = False  # answer reused from the semantic cache
+    session_id: Optional[str] = None
 
 
 class ChatHistoryItem(BaseModel):
@@ -50,3 +53,13 @@ class ChatHistoryItem(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class DocumentChunk(BaseModel):
+    country: str
+    text_chunk: str
+    embedding: List[float]
+
+
+class AppendDocumentsRequest(BaseModel):
+    chunks: List[DocumentChunk]
@@ -0,0 +1,189 @@
+"""
+Semantic answer cache for near-duplicate questions.
+
+Generated answers are stored with the question's embedding, per country
+filter. A new question is answered from the cache when its cosine
+similarity to a stored question of the same country reaches the threshold,
+so paraphrases ("uk visa cost?" / "How much is a UK student visa?") skip
+the LLM call. Each country partition keeps its question vectors in one
+preallocated float32 matrix, so a lookup is a single matrix-vector product.
+
+Entries expire after ttl_seconds, the least recently used entry is evicted
+once max_size answers are stored, and everything is dropped when the index
+version changes (answers may cite chunks that no longer exist).
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Rows added to a partition's matrix when it fills up
+GROWTH_ROWS = 64
+
+
+class _Partition:
+    """Cached questions and answers for one country filter"""
+
+    def __init__(self, dim: int):
+        self.vectors = np.zeros((GROWTH_ROWS, dim), dtype=np.float32)
+        self.stored_at = np.zeros(GROWTH_ROWS, dtype=np.float64)
+        self.used_at = np.zeros(GROWTH_ROWS, dtype=np.float64)
+        self.answers: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.answers)
+
+    def add(self, vector: np.ndarray, answer: str, now: float) -> None:
+        n = len(self.answers)
+        if n == len(self.vectors):
+            grow = max(GROWTH_ROWS, n)
+            self.vectors = np.concatenate([self.vectors, np.zeros((grow, self.vectors.shape[1]), np.float32)])
+            self.stored_at = np.concatenate([self.stored_at, np.zeros(grow)])
+            self.used_at = np.concatenate([self.used_at, np.zeros(grow)])
+        self.vectors[n] = vector
+        self.stored_at[n] = now
+        self.used_at[n] = now
+        self.answers.append(answer)
+
+    def remove(self, index: int) -> None:
+        """Drop an entry by moving the last one into its slot"""
+        last = len(self.answers) - 1
+        if index != last:
+            self.vectors[index] = self.vectors[last]
+            self.stored_at[index] = self.stored_at[last]
+            self.used_at[index] = self.used_at[last]
+            self.answers[index] = self.answers[last]
+        self.answers.pop()
+
+
+class SemanticCache:
+    """
+    Thread-safe question-embedding -> answer cache, partitioned by country.
+    threshold: minimum cosine similarity for a hit
+    ttl_seconds <= 0 disables expiry; max_size <= 0 disables the cache.
+    """
+
+    def __init__(self, max_size: int, threshold: float = 0.9, ttl_seconds: float = 0):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self._partitions: Dict[str, _Partition] = {}
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _normalize(vector: np.ndarray) -> Optional[np.ndarray]:
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm > 0 else None
+
+    def _check_version(self, version: int) -> None:
+        if version != self._version:
+            self._partitions.clear()
+            self._version = version
+
+    def get(self, version: int, country: Optional[str], embedding: np.ndarray) -> Optional[str]:
+        """Cached answer for the most similar question at or above the threshold, else None"""
+        if self.max_size <= 0:
+            return None
+        query = self._normalize(embedding)
+
+        with self._lock:
+            self._check_version(version)
+            partition = self._partitions.get((country or "").lower())
+            if query is None or partition is None or not len(partition) \
+                    or partition.vectors.shape[1] != len(query):
+                self.misses += 1
+                return None
+
+            n = len(partition)
+            similarity = partition.vectors[:n] @ query
+            if self.ttl_seconds > 0:
+                now = time.time()
+                similarity[now - partition.stored_at[:n] > self.ttl_seconds] = -np.inf
+            best = int(np.argmax(similarity))
+            if similarity[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            partition.used_at[best] = time.time()
+            self.hits += 1
+            return partition.answers[best]
+
+    def put(self, version: int, country: Optional[str], embedding: np.ndarray, answer: str) -> None:
+        if self.max_size <= 0:
+            return
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+
+        with self._lock:
+            self._check_version(version)
+            key = (country or "").lower()
+            partition = self._partitions.get(key)
+            if partition is None or partition.vectors.shape[1] != len(vector):
+                partition = self._partitions[key] = _Partition(len(vector))
+
+            now = time.time()
+            self._expire(now)
+            while len(self) >= self.max_size:
+                self._evict_lru()
+            partition.add(vector, answer, now)
+
+    def _expire(self, now: float) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        for partition in self._partitions.values():
+            expired = np.flatnonzero(now - partition.stored_at[:len(partition)] > self.ttl_seconds)
+            for index in expired[::-1]:
+                partition.remove(int(index))
+
+    def _evict_lru(self) -> None:
+        partition, index = min(
+            ((p, int(np.argmin(p.used_at[:len(p)]))) for p in self._partitions.values() if len(p)),
+            key=lambda item: item[0].used_at[item[1]]
+        )
+        partition.remove(index)
+        self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._partitions.clear()
+
+    def __len__(self) -> int:
+        return sum(len(p) for p in self._partitions.values())
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "max_size": self.max_size,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "partitions": {key or "all": len(p) for key, p in self._partitions.items()},
+        }
+
+
+# Global instance
+semantic_cache = None
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Get or create the global semantic answer cache, sized from settings"""
+    global semantic_cache
+    if semantic_cache is None:
+        from config import get_settings
+        settings = get_settings()
+        semantic_cache = SemanticCache(
+            max_size=settings.semantic_cache_size,
+            threshold=settings.semantic_cache_threshold,
+            ttl_seconds=settings.semantic_cache_ttl_seconds
+        )
+    return semantic_cache
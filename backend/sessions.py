@@ -0,0 +1,165 @@
+"""
+Conversation sessions for multi-turn chat.
+
+A session remembers, per provider, the state that lets a follow-up continue
+the conversation instead of starting over. For Ollama that is the `context`
+token array returned by /api/generate: passed back with the next prompt,
+the model resumes from it without re-processing the instructions and
+context of the earlier turns, so a follow-up only pays for its own new
+tokens. The session also records which chunks that provider has already
+seen (only new ones are sent again), and keeps the previous turn's question
+and retrieval results, so a terse follow-up like "and for Canada?" is
+searched together with the question it follows, and answered from the last
+results when the search finds nothing.
+
+Memory is bounded: SessionStore keeps at most max_sessions (least recently
+used evicted first), drops sessions idle for ttl_seconds, and forgets a
+provider's context once it grows past max_context_tokens (the next turn then
+sends a full prompt again). Context tokens are stored as array('i'), 4 bytes
+each instead of a Python int object per token.
+"""
+import time
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+# A question with at most this many words is treated as a follow-up of the previous one when searching
+FOLLOWUP_MAX_WORDS = 6
+
+
+def chunk_key(country: str, text: str) -> int:
+    return hash((country, text))
+
+
+class ProviderContext:
+    """What one provider already holds of the conversation"""
+
+    def __init__(self, tokens: Sequence[int], chunks: Set[int]):
+        self.tokens = array("i", tokens)
+        self.chunks = chunks
+
+
+class ConversationSession:
+    def __init__(self, key: str):
+        self.key = key
+        self.turns = 0
+        self.last_question: Optional[str] = None
+        self.last_country: Optional[str] = None
+        self.last_results: List[Tuple[str, str, float]] = []
+        self.last_token_counts: List[int] = []
+        self.contexts: Dict[str, ProviderContext] = {}
+        self.updated_at = time.monotonic()
+
+    def retrieval_query(self, question: str) -> str:
+        """The question, prefixed with the previous one if it reads like a short follow-up"""
+        if self.last_question and len(question.split()) <= FOLLOWUP_MAX_WORDS:
+            return f"{self.last_question} {question}"
+        return question
+
+    def context_for(self, provider: str) -> Optional[ProviderContext]:
+        return self.contexts.get(provider)
+
+    def set_context(self, provider: str, tokens: Optional[Sequence[int]], chunks: Set[int]) -> None:
+        if tokens:
+            self.contexts[provider] = ProviderContext(tokens, chunks)
+        else:
+            self.contexts.pop(provider, None)
+
+    def answered_by(self, provider: str) -> None:
+        """Other providers' contexts miss this turn now: drop them rather than continue from a gap"""
+        for name in list(self.contexts):
+            if name != provider:
+                del self.contexts[name]
+
+    def record_turn(self, question: str, country: Optional[str], results, token_counts) -> None:
+        self.turns += 1
+        self.last_question = question
+        self.last_country = country
+        self.last_results = list(results)
+        self.last_token_counts = list(token_counts)
+        self.updated_at = time.monotonic()
+
+    def context_tokens(self) -> int:
+        return sum(len(context.tokens) for context in self.contexts.values())
+
+
+class SessionStore:
+    """LRU of conversation sessions with idle expiry (one event loop; not thread-safe)"""
+
+    def __init__(self, max_sessions: int = 1000, ttl_seconds: float = 1800, max_context_tokens: int = 8192):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_context_tokens = max_context_tokens
+        self.sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self.hits = 0
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def get(self, key: str) -> ConversationSession:
+        """The session for key, created if it is new or has expired"""
+        self._expire()
+        session = self.sessions.get(key)
+        if session is not None:
+            self.sessions.move_to_end(key)
+            session.updated_at = time.monotonic()
+            self.hits += 1
+            return session
+
+        session = ConversationSession(key)
+        self.sessions[key] = session
+        self.created += 1
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+            self.evicted += 1
+        return session
+
+    def trim(self, session: ConversationSession) -> None:
+        """After a turn: forget provider contexts that have outgrown max_context_tokens"""
+        for provider, context in list(session.contexts.items()):
+            if len(context.tokens) > self.max_context_tokens:
+                del session.contexts[provider]
+
+    def _expire(self) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        cutoff = time.monotonic() - self.ttl_seconds
+        # Least recently used first: stop at the first session still in use
+        while self.sessions:
+            key, session = next(iter(self.sessions.items()))
+            if session.updated_at >= cutoff:
+                break
+            del self.sessions[key]
+            self.expired += 1
+
+    def clear(self) -> None:
+        self.sessions.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "created": self.created,
+            "hits": self.hits,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "context_tokens": sum(session.context_tokens() for session in self.sessions.values()),
+        }
+
+
+# Global instance
+session_store = None
+
+
+def get_session_store() -> SessionStore:
+    """Get or create the global session store"""
+    global session_store
+    if session_store is None:
+        from config import get_settings
+        settings = get_settings()
+        session_store = SessionStore(
+            max_sessions=settings.session_max_count,
+            ttl_seconds=settings.session_ttl_seconds,
+            max_context_tokens=settings.session_max_context_tokens
+        )
+    return session_store
@@ -0,0 +1,105 @@
+"""
+Search matrix shared between API worker processes.
+
+The prepared search matrix (normalized, grouped by country and possibly
+quantized) is published once into the binary store and every worker
+memory-maps it read-only, so all workers share the same page-cache pages
+instead of each holding a private copy:
+
+    search_index.json     store generation, precision and shape
+    search_matrix.bin     search matrix in the published precision, count x dim
+    search_scales.f32     float32 per-row scales (int8 only)
+    search_row_ids.i64    int64 store row of each search-matrix row
+    index.lock            serializes building and attaching across processes
+
+The other store side files (BM25, IVF, query embedder) are memory-mapped as
+well, so a worker that starts after the first one attaches without building
+anything. Files are replaced via rename (see embedding_store.write_array),
+so workers still mapping an older generation keep consistent data.
+"""
+import json
+import os
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+from embedding_store import write_array
+
+SHARED_META_FILE = "search_index.json"
+SHARED_MATRIX_FILE = "search_matrix.bin"
+SHARED_SCALES_FILE = "search_scales.f32"
+SHARED_ROW_IDS_FILE = "search_row_ids.i64"
+LOCK_FILE = "index.lock"
+
+
+@contextmanager
+def index_lock(path: str) -> Iterator[None]:
+    """Exclusive cross-process lock on a store's index files (no-op where flock is unavailable)"""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    with open(os.path.join(path, LOCK_FILE), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def publish(
+        path: str,
+        generation: int,
+        row_ids: np.ndarray,
+        matrix: np.ndarray,
+        scales: Optional[np.ndarray]
+) -> None:
+    """Write a prepared search matrix into a store directory; the metadata goes last"""
+    write_array(os.path.join(path, SHARED_ROW_IDS_FILE), np.asarray(row_ids, dtype=np.int64))
+    write_array(os.path.join(path, SHARED_MATRIX_FILE), np.ascontiguousarray(matrix))
+    if scales is not None:
+        write_array(os.path.join(path, SHARED_SCALES_FILE), np.asarray(scales, dtype=np.float32))
+
+    meta = {
+        "generation": generation,
+        "precision": matrix.dtype.name,
+        "count": int(len(matrix)),
+        "dim": int(matrix.shape[1]),
+    }
+    tmp_path = os.path.join(path, SHARED_META_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, SHARED_META_FILE))
+
+
+def attach(
+        path: str,
+        generation: int,
+        precision: str
+) -> Optional[Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]]:
+    """
+    Memory-map a published search matrix read-only.
+    Returns: (row_ids, matrix, scales), or None if it is
+    missing or was built from another generation or precision
+    """
+    meta_path = os.path.join(path, SHARED_META_FILE)
+    if not os.path.isfile(meta_path):
+        return None
+
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta["generation"] != generation or meta["precision"] != precision:
+        return None
+
+    count, dim = meta["count"], meta["dim"]
+    if count == 0:
+        return None
+    row_ids = np.memmap(os.path.join(path, SHARED_ROW_IDS_FILE), dtype=np.int64, mode="r", shape=(count,))
+    matrix = np.memmap(os.path.join(path, SHARED_MATRIX_FILE), dtype=precision, mode="r", shape=(count, dim))
+    scales = None
+    if precision == "int8":
+        scales = np.memmap(os.path.join(path, SHARED_SCALES_FILE), dtype=np.float32, mode="r", shape=(count,))
+    return row_ids, matrix, scales
@@ -0,0 +1,45 @@
+"""
+Single-flight coalescing of identical concurrent calls.
+
+The first caller for a key (the leader) starts the work as a task; callers
+with the same key that arrive while it is running await that task instead
+of starting their own, and all of them get its result or exception. The
+task is shielded, so a leader whose request is cancelled (client went away)
+does not cancel the work the others are waiting on.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Coalesces concurrent async calls by key within one event loop"""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await fn(), or the in-flight call already running for key"""
+        task = self._flights.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self.leaders + self.coalesced
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": self.coalesced / requests if requests else 0.0,
+            "in_flight": len(self._flights),
+        }
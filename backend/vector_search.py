@@ -1,34 +1,488 @@
-import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Sequence, Union
+import copy
+import contextlib
+import itertools
 import json
+import threading
+import time
+
+from embedding_store import EmbeddingStore, StoreWriter, is_store, read_meta
+from ann_index import IVFIndex
+from local_embedder import LocalEmbedder
+from cache import EmbeddingCache, ResultCache
+from bm25 import BM25Index, reciprocal_rank_fusion
+from quantization import PRECISIONS, quantize, scores as quantized_scores
+import shared_index
+from mmr import mmr, scale_scores
+from context_builder import estimate_tokens, estimate_tokens_from_bytes
+
+DEFAULT_CSV_PATH = "study_abroad_embeddings_local.csv"
+DEFAULT_STORE_PATH = "study_abroad_store"
+
+DEFAULT_EMBEDDING_CACHE_SIZE = 2048
+
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
+# Candidates taken from each ranking before reciprocal rank fusion
+HYBRID_CANDIDATES = 50
+RRF_K = 60
+
+# Upper bound on the (queries x documents) score block held in memory by search_batch
+BATCH_SCORE_BLOCK_ELEMENTS = 16 * 1024 * 1024
+
+# Maximal marginal relevance defaults: candidates re-ranked and relevance/diversity trade-off
+DEFAULT_MMR_FETCH_K = 30
+DEFAULT_MMR_LAMBDA = 0.7
+
+# Rows normalized (and quantized) at a time while building the search matrix
+BUILD_BLOCK_ROWS = 65536
+
+# With an int8 matrix, top_k * DEFAULT_RESCORE_FACTOR candidates are rescored in float32
+DEFAULT_RESCORE_FACTOR = 4
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row of a 2-D float32 array (zero rows are left as zeros)"""
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-row top-k of a 2-D score array. Returns: (column indices, scores), best first"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(scores.dtype)
+
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def _country_keys(names: Sequence[str]) -> np.ndarray:
+    """Partition id of every country id: names differing only in case share the first one's id"""
+    first: Dict[str, int] = {}
+    return np.array([first.setdefault(name.lower(), i) for i, name in enumerate(names)], dtype=np.int64)
+
+
+_gemini_configured = False
+
+# Every index snapshot gets a new version, so caches can tell snapshots apart
+_versions = itertools.count(1)
+
+
+def _gemini_client():
+    """Import and configure google.generativeai once per process"""
+    global _gemini_configured
+    import google.generativeai as genai
+
+    if not _gemini_configured:
+        from config import get_settings
+        genai.configure(api_key=get_settings().gemini_api_key)
+        _gemini_configured = True
+    return genai
+
+
+class _LiveTexts:
+    """Text column view that reads deleted rows as empty strings"""
+
+    def __init__(self, texts, live: np.ndarray):
+        self._texts = texts
+        self._live = live
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def __getitem__(self, index: int) -> str:
+        return self._texts[index] if self._live[index] else ""
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
 
 
 class VectorSearch:
-    def __init__(self, embeddings_path: str = "study_abroad_embeddings_local.csv"):
-        """Initialize the vector search with embeddings from CSV file"""
+    def __init__(
+            self,
+            embeddings_path: str = DEFAULT_CSV_PATH,
+            index_type: str = "exact",
+            ivf_nprobe: int = 8,
+            ivf_lists: Optional[int] = None,
+            embedding_cache: Optional[EmbeddingCache] = None,
+            result_cache: Optional[ResultCache] = None,
+            precision: str = "float32",
+            rescore_factor: int = DEFAULT_RESCORE_FACTOR,
+            shared: bool = False
+    ):
+        """
+        Initialize the vector search from a binary embedding store or a CSV file.
+        index_type: "exact" (brute force) or "ivf" (approximate, see ann_index.py)
+        precision: "float32" or "int8" storage of the search matrix ("float16" is read as int8)
+        (see quantization.py); below float32, top_k * rescore_factor candidates
+        are rescored against the float32 embeddings (binary store only: the CSV path uses float32)
+        result_cache: ranked results per query (see cache.ResultCache); none by default
+        shared: publish the prepared index into the store and memory-map it, so
+        worker processes share one copy (see shared_index.py)
+        """
+        if precision == "float16":
+            print("Warning: float16 search matrices are no longer supported (slow to score); using int8")
+            precision = "int8"
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown vector precision '{precision}', expected one of {PRECISIONS}")
         print(f"Loading embeddings from {embeddings_path}...")
-        self.df = pd.read_csv(embeddings_path)
+        self.embeddings_path = embeddings_path
+        self.version = next(_versions)
+        self.store: Optional[EmbeddingStore] = None
+        self.ann: Optional[IVFIndex] = None
+        self.ivf_nprobe = ivf_nprobe
+        self.ivf_lists = ivf_lists
+        self.precision = precision
+        self.rescore_factor = max(1, rescore_factor)
+        self.embedding_cache = (
+            embedding_cache if embedding_cache is not None else EmbeddingCache(DEFAULT_EMBEDDING_CACHE_SIZE)
+        )
+        self.result_cache = result_cache if result_cache is not None else ResultCache(0)
+
+        if index_type not in ("exact", "ivf"):
+            raise ValueError(f"Unknown vector index type '{index_type}'")
+
+        if is_store(embeddings_path):
+            self._load_store(embeddings_path)
+        else:
+            self._load_csv(embeddings_path)
 
-        # Convert string embeddings to numpy arrays
-        self.df['embedding_array'] = self.df['embedding'].apply(
-            lambda x: np.array(json.loads(x)) if isinstance(x, str) else x
+        if self.store is None and self.precision != "float32":
+            # Rescoring needs the float32 embeddings; from the CSV they are in memory, not memory-mapped,
+            # so a compact matrix next to them would add memory instead of saving it
+            print(f"Warning: {self.precision} precision needs the binary store; using float32 for the CSV")
+            self.precision = "float32"
+
+        self.shared = shared and self.store is not None
+        if shared and not self.shared:
+            print("Warning: a shared index needs a binary store; building a private index")
+
+        # In shared mode the first process builds and persists everything; the rest wait and attach
+        with self._index_lock():
+            self._prepare(index_type == "ivf", ivf_lists)
+        print(f"Loaded {len(self.matrix)} document chunks")
+
+    def _prepare(self, ivf: bool, ivf_lists: Optional[int]):
+        """Build or attach the search matrix and open the side indexes (under the index lock)"""
+        if self.shared:
+            self._attach_index()
+        else:
+            self._build_index()
+        self._load_embedder()
+        self._load_lexical()
+        if ivf:
+            self._load_ann(ivf_lists)
+        if self.shared:
+            self._map_side_indexes()
+
+    def _load_store(self, path: str):
+        """Memory-map a binary embedding store (see embedding_store.py)"""
+        self.store = EmbeddingStore(path)
+        self.embeddings = self.store.vectors
+        self.country_ids = self.store.country_ids
+        self.country_names = self.store.country_names
+        self.texts = self.store.texts
+        # Token estimate per chunk for prompt budgeting (see context_builder.py)
+        self.token_counts = estimate_tokens_from_bytes(self.store.texts.byte_lengths())
+        self._set_partition_ids()
+
+    def _load_csv(self, path: str):
+        """Load the legacy country,text_chunk,embedding CSV"""
+        import pandas as pd
+
+        df = pd.read_csv(path)
+
+        # Convert string embeddings to a single float32 matrix
+        self.embeddings = np.array(
+            [json.loads(x) if isinstance(x, str) else x for x in df['embedding']],
+            dtype=np.float32
+        )
+        codes, names = pd.factorize(df['country'].astype(str))
+        self.country_ids = codes.astype(np.uint16)
+        self.country_names = names.tolist()
+        self.texts = df['text_chunk'].astype(str).tolist()
+        self.token_counts = np.array([estimate_tokens(text) for text in self.texts], dtype=np.int32)
+        self._set_partition_ids()
+
+    def _set_partition_ids(self):
+        """
+        Country partition of every row. Stores written before country names were
+        matched ignoring case may hold "USA" and "usa" as separate ids; their rows
+        share one partition, so a country filter covers all of them.
+        """
+        keys = _country_keys(self.country_names)
+        country_ids = np.asarray(self.country_ids)
+        if np.array_equal(keys, np.arange(len(keys))):
+            self.partition_ids = country_ids
+        else:
+            self.partition_ids = keys[country_ids].astype(np.uint16)
+
+    def _build_index(self):
+        """
+        Build the search matrix once: rows grouped by country and L2-normalized
+        in a single contiguous float32 array, so cosine similarity is a plain
+        dot product and a country filter is a slice (a view, not a copy).
+        """
+        live = self.store.live_mask() if self.store is not None else None
+
+        # matrix row i holds document row_ids[i]; deleted rows are left out
+        self.row_ids = np.argsort(self.partition_ids, kind="stable")
+        if live is not None:
+            self.row_ids = self.row_ids[live[self.row_ids]]
+        self._build_matrix()
+        self._set_partitions(np.bincount(self.partition_ids[self.row_ids], minlength=len(self.country_names)))
+
+    def _index_lock(self):
+        return shared_index.index_lock(self.store.path) if self.shared else contextlib.nullcontext()
+
+    def _attach_index(self):
+        """Memory-map the published search matrix, building and publishing it first if needed"""
+        attached = shared_index.attach(self.store.path, self.store.generation, self.precision)
+        if attached is None:
+            self._build_index()
+            self._publish_index()
+            return
+
+        row_partitions = self.partition_ids[attached[0]]
+        if np.any(row_partitions[1:] < row_partitions[:-1]):
+            # Published before same-name countries were merged: its rows are not grouped by partition
+            self._build_index()
+            self._publish_index()
+            return
+
+        self.row_ids, self.matrix, self.matrix_scales = attached
+        self._set_partitions(np.bincount(row_partitions, minlength=len(self.country_names)))
+
+    def _publish_index(self):
+        """Write the search matrix into the store and swap the private copy for a shared mapping"""
+        try:
+            shared_index.publish(self.store.path, self.store.generation, self.row_ids, self.matrix, self.matrix_scales)
+        except OSError as e:
+            print(f"Could not publish the shared index, keeping a private copy: {e}")
+            return
+        attached = shared_index.attach(self.store.path, self.store.generation, self.precision)
+        if attached is not None:
+            self.row_ids, self.matrix, self.matrix_scales = attached
+
+    def _map_side_indexes(self):
+        """Swap side indexes built in this process for memory-mapped copies of their saved files"""
+        path, generation = self.store.path, self.store.generation
+        self.bm25 = BM25Index.load(path, len(self.texts), generation) or self.bm25
+        if self.embedder is not None:
+            self.embedder = LocalEmbedder.load(path, generation) or self.embedder
+        if self.ann is not None:
+            self.ann = IVFIndex.load(path, len(self.matrix), generation, self.ann.n_lists) or self.ann
+
+    def _build_matrix(self):
+        """
+        Gather, normalize and quantize the search matrix block by block, so a
+        compact matrix never needs a full float32 copy alongside it
+        """
+        embeddings = np.asarray(self.embeddings)
+        dim = embeddings.shape[1] if embeddings.ndim == 2 else 0
+        self.matrix = np.empty((len(self.row_ids), dim), dtype=self.precision)
+        self.matrix_scales: Optional[np.ndarray] = (
+            np.empty(len(self.row_ids), dtype=np.float32) if self.precision == "int8" else None
         )
-        print(f"Loaded {len(self.df)} document chunks")
+        for start in range(0, len(self.row_ids), BUILD_BLOCK_ROWS):
+            rows = self.row_ids[start:start + BUILD_BLOCK_ROWS]
+            data, scales = quantize(_normalize_rows(embeddings[rows]), self.precision)
+            self.matrix[start:start + len(rows)] = data
+            if scales is not None:
+                self.matrix_scales[start:start + len(rows)] = scales
+
+    def _set_partitions(self, counts: np.ndarray):
+        """Per-country slices of the search matrix from per-partition-id row counts"""
+        ends = np.cumsum(counts)
+        self.partitions: Dict[str, slice] = {
+            name.lower(): slice(int(end - count), int(end))
+            for name, count, end in zip(self.country_names, counts, ends)
+            if count > 0
+        }
+        self.country_index = {}
+        for i, name in enumerate(self.country_names):
+            self.country_index.setdefault(name.lower(), i)
+
+    def _load_ann(self, n_lists: Optional[int]):
+        """Open the persisted IVF index, training (and persisting) it if missing or stale"""
+        if self.store is not None:
+            self.ann = IVFIndex.load(self.store.path, len(self.matrix), self.store.generation, n_lists)
+        if self.ann is None:
+            generation = self.store.generation if self.store is not None else 0
+            self.ann = IVFIndex.build(self.matrix, n_lists=n_lists, generation=generation)
+            if self.store is not None:
+                self.ann.save(self.store.path)
+
+    def _load_embedder(self):
+        """Open the offline query embedder, fitting (and persisting) it if missing or stale"""
+        self.embedder: Optional[LocalEmbedder] = None
+        if self.store is not None:
+            self.embedder = LocalEmbedder.load(self.store.path, self.store.generation)
+        if self.embedder is None and len(self.texts) > 0:
+            generation = self.store.generation if self.store is not None else 0
+            self.embedder = LocalEmbedder.fit(self.texts, self.embeddings, generation=generation)
+            if self.store is not None:
+                self.embedder.save(self.store.path)
+
+    def _load_lexical(self):
+        """Open the BM25 index over text_chunk, building (and persisting) it if missing or stale"""
+        self.bm25: Optional[BM25Index] = None
+        if self.store is not None:
+            self.bm25 = BM25Index.load(self.store.path, len(self.texts), self.store.generation)
+        if self.bm25 is None:
+            generation = self.store.generation if self.store is not None else 0
+            live = self.store.live_mask() if self.store is not None else None
+            texts = self.texts if live is None else _LiveTexts(self.texts, live)
+            self.bm25 = BM25Index.build(texts, generation=generation)
+            if self.store is not None:
+                self.bm25.save(self.store.path)
+
+    def append(self, countries: Sequence[str], texts: Sequence[str], embeddings: np.ndarray) -> "VectorSearch":
+        """
+        Add document chunks and return a new snapshot; this instance is left untouched,
+        so searches already running on it are unaffected. Rows are written to the
+        binary store (when loaded from one), and only the new rows are normalized,
+        tokenized and assigned to IVF lists.
+        """
+        with self._index_lock():
+            return self._append(countries, texts, embeddings)
+
+    def _append(self, countries: Sequence[str], texts: Sequence[str], embeddings: np.ndarray) -> "VectorSearch":
+        embeddings = np.array(embeddings, dtype=np.float32, ndmin=2)
+        if embeddings.shape[1] != self.matrix.shape[1]:
+            raise ValueError(f"Expected {self.matrix.shape[1]}-dimensional embeddings, got {embeddings.shape[1]}")
+        if not (len(countries) == len(texts) == len(embeddings)):
+            raise ValueError("countries, texts and embeddings must have the same length")
+
+        if self.store is None:
+            return self._extended(len(self.texts), countries, texts, embeddings)
+
+        with StoreWriter(self.store.path) as writer:
+            # Another process may have committed rows since this snapshot was loaded;
+            # the new rows go after them, so extend a snapshot that includes them
+            base = self if writer.meta.get("generation", 0) == self.store.generation else self._refreshed()
+            first_row = writer.meta["count"]
+            writer.add_batch(countries, texts, embeddings)
+        return base._extended(first_row, countries, texts, embeddings)
+
+    def _refreshed(self) -> "VectorSearch":
+        """A snapshot of the store as now committed on disk, with this one's settings"""
+        print(f"Embedding store {self.store.path} changed since the index was loaded, refreshing")
+        snapshot = copy.copy(self)
+        snapshot.version = next(_versions)
+        snapshot._load_store(self.store.path)
+        snapshot._prepare(self.ann is not None, self.ivf_lists)
+        return snapshot
+
+    def _extended(self, first_row: int, countries: Sequence[str], texts: Sequence[str],
+                  embeddings: np.ndarray) -> "VectorSearch":
+        """New snapshot with the chunks added as rows first_row, first_row + 1, ... (already committed to a store)"""
+        snapshot = copy.copy(self)
+        snapshot.version = next(_versions)
+
+        if self.store is not None:
+            snapshot._load_store(self.store.path)
+            generation = snapshot.store.generation
+        else:
+            names = list(self.country_names)
+            index = {}
+            for i, name in enumerate(names):
+                index.setdefault(name.lower(), i)
+            for country in countries:
+                if country.lower() not in index:
+                    index[country.lower()] = len(names)
+                    names.append(country)
+            snapshot.country_names = names
+            snapshot.country_ids = np.concatenate([
+                np.asarray(self.country_ids),
+                np.array([index[c.lower()] for c in countries], dtype=np.uint16)
+            ])
+            snapshot.texts = list(self.texts) + list(texts)
+            snapshot.token_counts = np.concatenate([
+                self.token_counts,
+                np.array([estimate_tokens(text) for text in texts], dtype=np.int32)
+            ])
+            snapshot.embeddings = np.vstack([self.embeddings, embeddings])
+            snapshot._set_partition_ids()
+            generation = 0
+
+        new_rows = np.arange(first_row, first_row + len(embeddings))
+        new_ids = np.asarray(snapshot.partition_ids)[new_rows]
+        new_vectors = _normalize_rows(embeddings)
+
+        # Insert each country's new rows at the end of its partition: the result
+        # is the same layout _build_index would produce from scratch
+        new_data, new_scales = quantize(new_vectors, self.precision)
+        matrix_parts, scale_parts, row_id_parts, counts = [], [], [], []
+        position_map = np.empty(len(self.matrix), dtype=np.int64)
+        new_positions = np.empty(len(new_rows), dtype=np.int64)
+        position = 0
+        keys = _country_keys(snapshot.country_names)
+        for country_id, name in enumerate(snapshot.country_names):
+            if keys[country_id] != country_id:
+                # Rows of this spelling live in the partition of the first one
+                counts.append(0)
+                continue
+            old = self.partitions.get(name.lower(), slice(0, 0))
+            added = np.flatnonzero(new_ids == country_id)
+
+            position_map[old] = np.arange(position, position + old.stop - old.start)
+            position += old.stop - old.start
+            new_positions[added] = np.arange(position, position + len(added))
+            position += len(added)
+
+            matrix_parts += [self.matrix[old], new_data[added]]
+            if new_scales is not None:
+                scale_parts += [self.matrix_scales[old], new_scales[added]]
+            row_id_parts += [self.row_ids[old], new_rows[added]]
+            counts.append(old.stop - old.start + len(added))
+
+        snapshot.matrix = np.concatenate(matrix_parts)
+        snapshot.matrix_scales = np.concatenate(scale_parts) if scale_parts else None
+        snapshot.row_ids = np.concatenate(row_id_parts)
+        snapshot._set_partitions(np.array(counts, dtype=np.int64))
+
+        snapshot.bm25 = self.bm25.extend(texts, generation)
+        if self.ann is not None:
+            snapshot.ann = self.ann.extend(position_map, new_positions, new_vectors, generation)
+        if self.embedder is not None:
+            snapshot.embedder = LocalEmbedder(self.embedder.projection, generation)
+
+        if snapshot.store is not None:
+            snapshot.bm25.save(snapshot.store.path)
+            if snapshot.ann is not None:
+                snapshot.ann.save(snapshot.store.path)
+            if snapshot.embedder is not None:
+                snapshot.embedder.save(snapshot.store.path)
+            if snapshot.shared:
+                snapshot._publish_index()
+                snapshot._map_side_indexes()
+
+        print(f"Appended {len(new_rows)} document chunks ({len(snapshot.texts)} total)")
+        return snapshot
 
     def get_embedding(self, text: str, use_gemini: bool = False) -> np.ndarray:
         """
         Get embedding for a query text.
-        For simplicity, we'll use a basic averaging method.
-        In production, you'd want to use the same embedding model used for documents.
+        Uses Gemini's embedding model when use_gemini is set, otherwise the
+        offline embedder fitted to the document embeddings (local_embedder.py).
+        Gemini embeddings are cached by normalized query text.
         """
         if use_gemini:
+            cached = self.embedding_cache.get_embedding(text)
+            if cached is not None:
+                return cached
+
             try:
-                import google.generativeai as genai
-                from config import get_settings
-                settings = get_settings()
-                genai.configure(api_key=settings.gemini_api_key)
+                genai = _gemini_client()
 
                 # Use Gemini's embedding model
                 result = genai.embed_content(
@@ -36,69 +490,360 @@ class VectorSearch:
                     content=text,
                     task_type="retrieval_query"
                 )
-                return np.array(result['embedding'])
+                embedding = np.array(result['embedding'], dtype=np.float32)
+                self.embedding_cache.put_embedding(text, embedding)
+                return embedding
             except Exception as e:
                 print(f"Gemini embedding failed: {e}, using fallback")
                 return self._get_simple_embedding(text)
         else:
             return self._get_simple_embedding(text)
 
+    def get_embeddings(self, texts: Sequence[str], use_gemini: bool = False) -> np.ndarray:
+        """Embed many query texts; the offline embedder encodes the whole batch at once"""
+        if use_gemini or self.embedder is None:
+            return np.array([self.get_embedding(text, use_gemini=use_gemini) for text in texts], dtype=np.float32)
+        return self.embedder.encode_batch(texts)
+
     def _get_simple_embedding(self, text: str) -> np.ndarray:
-        """Fallback: use average of document embeddings as a simple approach"""
-        # For demo purposes - in production use proper embedding model
-        return self.df['embedding_array'].iloc[0]
+        """Offline query embedding in the same space as the document matrix"""
+        if self.embedder is None:
+            return np.zeros(self.matrix.shape[1], dtype=np.float32)
+        return self.embedder.encode(text)
+
+    def _partition(self, country: Optional[str]) -> slice:
+        """Rows of the search matrix to score for a country filter"""
+        if country:
+            partition = self.partitions.get(country.lower())
+            if partition is not None:
+                return partition
+            print(f"Warning: No documents found for country '{country}'")
+        return slice(0, len(self.matrix))
+
+    def _rank(self, query_embedding: np.ndarray, country: Optional[str], top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score one query against the search matrix.
+        Returns: (document row ids, similarity scores), best first
+        """
+        query = _normalize_rows(query_embedding)[0]
+        partition = self._partition(country)
+        candidates = top_k if self.precision == "float32" else top_k * self.rescore_factor
+
+        if self.ann is not None:
+            positions, scores = self.ann.search(
+                query, self.matrix, candidates, self.ivf_nprobe, partition, scales=self.matrix_scales
+            )
+        else:
+            similarities = quantized_scores(self.matrix[partition], self._scales(partition), query)
+            top, scores = _top_k(similarities[np.newaxis, :], candidates)
+            positions, scores = top[0] + partition.start, scores[0]
+
+        if self.precision != "float32":
+            return self._rescore(self.row_ids[positions], query, top_k)
+        return self.row_ids[positions], scores
+
+    def _scales(self, partition: slice) -> Optional[np.ndarray]:
+        return self.matrix_scales[partition] if self.matrix_scales is not None else None
+
+    def _rescore(self, rows: np.ndarray, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Re-rank candidate rows by float32 cosine similarity, reading only their
+        vectors from the (memory-mapped) embeddings. Returns: (row ids, scores), best first
+        """
+        if not len(rows):
+            return rows, np.empty(0, dtype=np.float32)
+        exact = _normalize_rows(np.asarray(self.embeddings)[rows]) @ query
+        top, scores = _top_k(exact[np.newaxis, :], top_k)
+        return rows[top[0]], scores[0]
+
+    def _rank_lexical(self, query: str, country: Optional[str], top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """BM25 ranking. Returns: (document row ids, BM25 scores), best first"""
+        country_id = None
+        if country:
+            country_id = self.country_index.get(country.lower())
+            if country_id is None or country.lower() not in self.partitions:
+                print(f"Warning: No documents found for country '{country}'")
+                country_id = None
+        return self.bm25.search(query, top_k, self.partition_ids, country_id)
+
+    def _rank_hybrid(self, query: str, query_embedding: np.ndarray, country: Optional[str],
+                     top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Reciprocal rank fusion of the vector and BM25 rankings. Returns: (row ids, fused scores)"""
+        candidates = max(top_k, HYBRID_CANDIDATES)
+        vector_rows, _ = self._rank(query_embedding, country, candidates)
+        lexical_rows, _ = self._rank_lexical(query, country, candidates)
+        rows, scores = reciprocal_rank_fusion([vector_rows, lexical_rows], k=RRF_K)
+        return rows[:top_k], scores[:top_k]
+
+    def _results(self, rows: np.ndarray, scores: np.ndarray, with_tokens: bool = False) -> List[tuple]:
+        """Materialize (country, text_chunk, similarity_score[, token_count]) tuples for ranked rows"""
+        if with_tokens:
+            return [
+                (self.country_names[self.country_ids[row]], self.texts[row], float(score), int(self.token_counts[row]))
+                for row, score in zip(rows, scores)
+            ]
+        return [
+            (self.country_names[self.country_ids[row]], self.texts[row], float(score))
+            for row, score in zip(rows, scores)
+        ]
 
     def search(
             self,
             query: str,
             country: Optional[str] = None,
             top_k: int = 5,
-            use_gemini: bool = False
+            use_gemini: bool = False,
+            mode: str = "vector",
+            with_tokens: bool = False
     ) -> List[Tuple[str, str, float]]:
         """
         Search for most similar document chunks
-        Returns: List of (country, text_chunk, similarity_score)
+        mode: "vector" (cosine similarity), "lexical" (BM25) or "hybrid" (reciprocal rank fusion of both)
+        with_tokens: append each chunk's estimated token count (computed at load time) to its tuple
+        Returns: List of (country, text_chunk, score); the score is the cosine similarity,
+        BM25 score or fused RRF score depending on mode
         """
-        # Get query embedding
-        query_embedding = self.get_embedding(query, use_gemini=use_gemini)
+        rows, scores = self._search_rows(query, country, top_k, use_gemini, mode)
+        return self._results(rows, scores, with_tokens)
 
-        # Filter by country if specified
-        df_filtered = self.df
-        if country:
-            df_filtered = self.df[self.df['country'].str.lower() == country.lower()]
-            if len(df_filtered) == 0:
-                print(f"Warning: No documents found for country '{country}'")
-                df_filtered = self.df
+    def search_diverse(
+            self,
+            query: str,
+            country: Optional[str] = None,
+            top_k: int = 5,
+            fetch_k: int = DEFAULT_MMR_FETCH_K,
+            lambda_mult: float = DEFAULT_MMR_LAMBDA,
+            max_similarity: float = 1.0,
+            use_gemini: bool = False,
+            mode: str = "vector",
+            with_tokens: bool = False
+    ) -> List[Tuple[str, str, float]]:
+        """
+        Search, then re-rank the best fetch_k chunks by maximal marginal relevance
+        (see mmr.py) so near-duplicate passages do not crowd out other information.
+        lambda_mult: 1.0 = relevance only, lower values favour diversity
+        max_similarity: chunks at least this similar to a chunk already picked are dropped
+        Returns: up to top_k (country, text_chunk, score[, token_count]), with scores as in search()
+        """
+        rows, scores = self._search_rows(query, country, max(top_k, fetch_k), use_gemini, mode)
+        vectors = _normalize_rows(np.asarray(self.embeddings)[rows]) if len(rows) else None
+        picked = mmr(scale_scores(scores), vectors, top_k, lambda_mult, max_similarity)
+        return self._results(rows[picked], scores[picked], with_tokens)
+
+    def _search_rows(self, query: str, country: Optional[str], top_k: int, use_gemini: bool,
+                     mode: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Ranking for search(), served from the result cache when possible. Returns: (row ids, scores)"""
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}', expected one of {SEARCH_MODES}")
+
+        query_embedding = None if mode == "lexical" else self.get_embedding(query, use_gemini=use_gemini)
+        key = ResultCache.key(self.version, mode, country, top_k, query, query_embedding)
+        ranked = self.result_cache.get(key)
+        if ranked is not None:
+            return ranked
+
+        if mode == "lexical":
+            ranked = self._rank_lexical(query, country, top_k)
+        elif mode == "hybrid":
+            ranked = self._rank_hybrid(query, query_embedding, country, top_k)
+        else:
+            ranked = self._rank(query_embedding, country, top_k)
+        self.result_cache.put(key, ranked)
+        return ranked
+
+    def search_batch(
+            self,
+            queries: Union[Sequence[str], np.ndarray],
+            countries: Union[None, str, Sequence[Optional[str]]] = None,
+            top_k: int = 5,
+            use_gemini: bool = False
+    ) -> List[List[Tuple[str, str, float]]]:
+        """
+        Search many queries at once. Queries sharing a country filter are scored
+        together with one matrix-matrix product instead of one matvec each.
+        Batch scoring is always exact, even when an IVF index is loaded.
+
+        queries: list of query strings, or an (n_queries, dim) array of query embeddings
+        countries: one filter for all queries, or one filter per query
+        Returns: one list of (country, text_chunk, similarity_score) per query
+        """
+        if len(queries) == 0:
+            return []
+
+        if isinstance(queries, np.ndarray):
+            query_matrix = _normalize_rows(queries)
+        else:
+            query_matrix = _normalize_rows(self.get_embeddings(queries, use_gemini=use_gemini))
+        n_queries = len(query_matrix)
 
-        # Calculate similarities
-        embeddings_matrix = np.vstack(df_filtered['embedding_array'].values)
-        similarities = cosine_similarity([query_embedding], embeddings_matrix)[0]
+        if countries is None or isinstance(countries, str):
+            countries = [countries] * n_queries
+        if len(countries) != n_queries:
+            raise ValueError("countries must be a single value or have one entry per query")
 
-        # Get top-k results
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        # Group queries by the matrix slice they score against
+        groups: Dict[Tuple[int, int], List[int]] = {}
+        for i, country in enumerate(countries):
+            partition = self._partition(country)
+            groups.setdefault((partition.start, partition.stop), []).append(i)
 
-        results = []
-        for idx in top_indices:
-            actual_idx = df_filtered.index[idx]
-            country_name = df_filtered.loc[actual_idx, 'country']
-            text_chunk = df_filtered.loc[actual_idx, 'text_chunk']
-            similarity = similarities[idx]
-            results.append((country_name, text_chunk, similarity))
+        results: List[List[Tuple[str, str, float]]] = [[] for _ in range(n_queries)]
+        candidates = top_k if self.precision == "float32" else top_k * self.rescore_factor
+        for (start, stop), indices in groups.items():
+            block_matrix = self.matrix[start:stop]
+            block_scales = self._scales(slice(start, stop))
+            block_size = max(1, BATCH_SCORE_BLOCK_ELEMENTS // max(1, stop - start))
+
+            for block_start in range(0, len(indices), block_size):
+                block = indices[block_start:block_start + block_size]
+                similarities = quantized_scores(block_matrix, block_scales, query_matrix[block])
+                top, scores = _top_k(similarities, candidates)
+                for i, rows, row_scores in zip(block, self.row_ids[top + start], scores):
+                    if self.precision != "float32":
+                        rows, row_scores = self._rescore(rows, query_matrix[i], top_k)
+                    results[i] = self._results(rows, row_scores)
 
         return results
 
     def get_available_countries(self) -> List[str]:
         """Get list of available countries in the dataset"""
-        return self.df['country'].unique().tolist()
+        return list(self.country_names)
 
 
-# Global instance
+# Global instances
 vector_search = None
+embedding_cache = None
+result_cache = None
+
+# Serializes index loads, reloads and appends; searches never take it
+_update_lock = threading.Lock()
+_reload_thread: Optional[threading.Thread] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get or create the process-wide query embedding cache (it outlives index reloads)"""
+    global embedding_cache
+    if embedding_cache is None:
+        from config import get_settings
+        settings = get_settings()
+        embedding_cache = EmbeddingCache(
+            max_size=settings.embedding_cache_size,
+            ttl_seconds=settings.embedding_cache_ttl_seconds,
+            path=settings.embedding_cache_path
+        )
+    return embedding_cache
+
+
+def get_result_cache() -> ResultCache:
+    """Get or create the process-wide retrieval result cache (cleared whenever the index is swapped)"""
+    global result_cache
+    if result_cache is None:
+        from config import get_settings
+        settings = get_settings()
+        result_cache = ResultCache(
+            max_size=settings.result_cache_size,
+            ttl_seconds=settings.result_cache_ttl_seconds
+        )
+    return result_cache
+
+
+def _default_embeddings_path() -> str:
+    return DEFAULT_STORE_PATH if is_store(DEFAULT_STORE_PATH) else DEFAULT_CSV_PATH
+
+
+def _create_vector_search() -> VectorSearch:
+    """Build a VectorSearch configured from settings"""
+    from config import get_settings
+    settings = get_settings()
+
+    return VectorSearch(
+        _default_embeddings_path(),
+        index_type=settings.vector_index,
+        ivf_nprobe=settings.ivf_nprobe,
+        ivf_lists=settings.ivf_lists or None,
+        embedding_cache=get_embedding_cache(),
+        result_cache=get_result_cache(),
+        precision=settings.vector_precision,
+        rescore_factor=settings.vector_rescore_factor,
+        shared=settings.vector_index_shared
+    )
 
 
 def get_vector_search() -> VectorSearch:
-    """Get or create the global vector search instance"""
+    """
+    Get or create the global vector search instance, preferring the binary store.
+    Callers should hold on to the returned snapshot for the duration of a request:
+    reloads and appends swap in a new instance rather than mutating this one.
+    """
     global vector_search
     if vector_search is None:
-        vector_search = VectorSearch()
+        with _update_lock:
+            if vector_search is None:
+                vector_search = _create_vector_search()
     return vector_search
+
+
+def _reload():
+    global vector_search
+    with _update_lock:
+        try:
+            new_instance = _create_vector_search()
+        except Exception as e:
+            print(f"Vector index reload failed, keeping the current index: {e}")
+            return
+        vector_search = new_instance
+        get_result_cache().clear()
+    print(f"Vector index reloaded (version {new_instance.version})")
+
+
+def reload_vector_search(wait: bool = False) -> bool:
+    """
+    Rebuild the index from disk in a background thread and swap it in when ready.
+    Returns False if a reload is already running.
+    """
+    global _reload_thread
+    if _reload_thread is not None and _reload_thread.is_alive():
+        return False
+
+    _reload_thread = threading.Thread(target=_reload, name="vector-index-reload", daemon=True)
+    _reload_thread.start()
+    if wait:
+        _reload_thread.join()
+    return True
+
+
+def append_to_vector_search(countries: Sequence[str], texts: Sequence[str], embeddings: np.ndarray) -> VectorSearch:
+    """Append chunks to the current index and swap in the resulting snapshot"""
+    global vector_search
+    current = get_vector_search()
+    with _update_lock:
+        current = vector_search or current
+        vector_search = current.append(countries, texts, embeddings)
+        get_result_cache().clear()
+    return vector_search
+
+
+def _store_generation(path: str) -> Optional[int]:
+    try:
+        return int(read_meta(path).get("generation", 0))
+    except (OSError, ValueError):
+        return None
+
+
+def start_store_watcher(interval_seconds: float) -> threading.Thread:
+    """Poll the binary store and reload the index when another process (e.g. ingestion) commits to it"""
+    def watch():
+        while True:
+            time.sleep(interval_seconds)
+            current = vector_search
+            path = _default_embeddings_path()
+            if current is None or not is_store(path):
+                continue
+            known = current.store.generation if current.store is not None and current.embeddings_path == path else None
+            if _store_generation(path) != known:
+                print(f"Embedding store {path} changed on disk, reloading")
+                reload_vector_search(wait=True)
+
+    thread = threading.Thread(target=watch, name="vector-store-watcher", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,91 @@
+"""
+Startup warmup and readiness.
+
+Right after boot a worker loads the vector index, runs one retrieval (so
+memory-mapped pages, BM25 and the query embedder are paged in) and warms
+each LLM provider (Ollama loads the model and keeps it resident; Gemini
+opens a pooled TLS connection). Until that has finished the worker reports
+itself as not ready, so a load balancer only routes users to warm workers.
+
+StartupTimer also records how long the worker took to import, to warm up
+and to serve its first request, for GET /ready and GET /api/metrics.
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+WARMUP_QUERY = "student visa requirements"
+
+
+class StartupTimer:
+    """Boot milestones in seconds since started_at (a time.perf_counter() value)"""
+
+    def __init__(self, started_at: float):
+        self.started_at = started_at
+        self.import_seconds: Optional[float] = None
+        self.ready_seconds: Optional[float] = None
+        self.first_request_seconds: Optional[float] = None
+        self.first_request_latency_seconds: Optional[float] = None
+        self.steps: Dict[str, Any] = {}
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_seconds is not None
+
+    def mark_imported(self) -> None:
+        self.import_seconds = self.elapsed()
+
+    def mark_ready(self) -> None:
+        if self.ready_seconds is None:
+            self.ready_seconds = self.elapsed()
+
+    def mark_first_request(self, latency_seconds: float) -> None:
+        if self.first_request_seconds is None:
+            self.first_request_seconds = self.elapsed()
+            self.first_request_latency_seconds = latency_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "import_seconds": self.import_seconds,
+            "ready_seconds": self.ready_seconds,
+            "first_request_seconds": self.first_request_seconds,
+            "first_request_latency_seconds": self.first_request_latency_seconds,
+            "steps": self.steps,
+        }
+
+
+async def warm_up(timer: StartupTimer) -> None:
+    """Preload the index, run a retrieval and warm the providers; marks the timer ready once the index is loaded"""
+    loop = asyncio.get_running_loop()
+
+    async def step(name: str, coro) -> None:
+        started = time.perf_counter()
+        try:
+            result = await coro
+            timer.steps[name] = {"seconds": round(time.perf_counter() - started, 4)}
+            if isinstance(result, dict):
+                timer.steps[name].update(result)
+        except Exception as e:
+            timer.steps[name] = {"seconds": round(time.perf_counter() - started, 4), "error": str(e)}
+            print(f"Warmup step '{name}' failed: {e}")
+
+    def load_index():
+        from vector_search import get_vector_search
+        get_vector_search()
+
+    await step("index", loop.run_in_executor(None, load_index))
+    if "error" in timer.steps["index"]:
+        # Without an index no question can be answered; stay out of rotation
+        return
+
+    from ai_service_unified import get_unified_ai_service
+    service = get_unified_ai_service()
+    await step("retrieval", service.retrieve(WARMUP_QUERY, None))
+    # A provider that is down does not keep the worker out of rotation: the router falls back
+    await step("providers", service.router.warm_up())
+
+    timer.mark_ready()
@@ -2,7 +2,7 @@
 
 import React, {useState, useEffect, useRef} from 'react';
 import ChatMessage from './ChatMessage';
-import {sendMessage, getChatHistory, deleteChatHistory} from '@/lib/api';
+import {streamMessage, getChatHistory, deleteChatHistory} from '@/lib/api';
 
 interface Message {
     role: 'user' | 'assistant';
@@ -16,6 +16,7 @@ const ChatInterface: React.FC = () => {
     const [messages, setMessages] = useState<Message[]>([]);
     const [input, setInput] = useState('');
     const [loading, setLoading] = useState(false);
+    const [streaming, setStreaming] = useState(false);
     const [selectedCountry, setSelectedCountry] = useState<string | null>(null);
     const [isListening, setIsListening] = useState(false);
     const [searchQuery, setSearchQuery] = useState('');
@@ -106,17 +107,38 @@ const ChatInterface: React.FC = () => {
         if (!retryData) setInput('');
         setLoading(true);
 
-        try {
-            const response = await sendMessage(questionToSend, countryToUse || undefined);
-
-            const aiMessage: Message = {
-                role: 'assistant',
-                content: response.answer,
-                country: response.country,
-                timestamp: new Date().toISOString()
-            };
+        let started = false;
+        const updateAnswer = (update: (message: Message) => Message) => {
+            setMessages((prev) => [...prev.slice(0, -1), update(prev[prev.length - 1])]);
+        };
 
-            setMessages((prev) => [...prev, aiMessage]);
+        try {
+            // The answer bubble appears with the first token and grows as the rest arrive
+            const response = await streamMessage(questionToSend, countryToUse || undefined, (token) => {
+                if (!started) {
+                    started = true;
+                    setStreaming(true);
+                    setMessages((prev) => [...prev, {
+                        role: 'assistant',
+                        content: token,
+                        country: countryToUse || undefined,
+                        timestamp: new Date().toISOString()
+                    }]);
+                } else {
+                    updateAnswer((message) => ({...message, content: message.content + token}));
+                }
+            });
+
+            if (started) {
+                updateAnswer((message) => ({...message, content: response.answer, country: response.country}));
+            } else {
+                setMessages((prev) => [...prev, {
+                    role: 'assistant',
+                    content: response.answer,
+                    country: response.country,
+                    timestamp: new Date().toISOString()
+                }]);
+            }
         } catch (error: any) {
             console.error('Failed to send message:', error);
 
@@ -132,6 +154,7 @@ const ChatInterface: React.FC = () => {
             setRetryMessage({question: questionToSend, country: countryToUse || undefined});
         } finally {
             setLoading(false);
+            setStreaming(false);
         }
     };
 
@@ -614,7 +637,7 @@ const ChatInterface: React.FC = () => {
                             <ChatMessage key={index} message={message}/>
                         ))}
 
-                        {loading && (
+                        {loading && !streaming && (
                             <div className="flex justify-start mb-4 animate-fadeIn">
                                 <div className="flex items-start gap-3">
                                     <div
@@ -154,6 +154,87 @@ export const sendMessage = async (question: string, country?: string) => {
     }
 };
 
+// Streams the answer over Server-Sent Events: onToken receives each piece of text as it is
+// generated, and the promise resolves with the full (saved) answer.
+export const streamMessage = async (
+    question: string,
+    country: string | undefined,
+    onToken: (token: string) => void
+): Promise<{ answer: string, country?: string }> => {
+    if (!question || !question.trim()) {
+        throw new Error('Please enter a question');
+    }
+
+    if (question.length > 1000) {
+        throw new Error('Question is too long. Please limit to 1000 characters.');
+    }
+
+    const token = typeof window !== 'undefined' ? localStorage.getItem('token') : null;
+    let response: Response;
+    try {
+        response = await fetch(`${API_URL}/api/chat/stream`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                ...(token ? {Authorization: `Bearer ${token}`} : {}),
+            },
+            body: JSON.stringify({question: question.trim(), country}),
+        });
+    } catch (error) {
+        throw new Error('Network error. Please check your internet connection and try again.');
+    }
+
+    if (!response.ok || !response.body) {
+        const data: any = await response.json().catch(() => ({}));
+        if (response.status === 401 && typeof window !== 'undefined') {
+            localStorage.removeItem('token');
+            if (window.location.pathname !== '/login') {
+                window.location.href = '/login';
+            }
+            throw new Error('Your session has expired. Please log in again.');
+        }
+        throw new Error(data?.message || data?.detail || 'Failed to send message. Please try again.');
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let answer = '';
+
+    while (true) {
+        const {done, value} = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, {stream: true});
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            for (const line of rawEvent.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            if (!data) continue;
+
+            const payload = JSON.parse(data);
+            if (event === 'done') {
+                return {answer: payload.answer, country: payload.country};
+            }
+            if (event === 'error') {
+                throw new Error(payload.message || 'The answer was interrupted. Please try again.');
+            }
+            answer += payload.token;
+            onToken(payload.token);
+        }
+    }
+
+    return {answer, country};
+};
+
 export const getChatHistory = async () => {
     try {
         const response = await api.get('/api/chat/history');